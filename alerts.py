@@ -0,0 +1,158 @@
+"""Due-date and budget alerts, computed in the background.
+
+A scan evaluates every user's bills, debts and budgets with a few set-based
+statements and reconciles the alerts table against the result: new
+conditions are inserted, conditions that no longer hold are removed and
+everything else is left untouched, so a scan only writes what changed.
+The app starts one scanner thread per process; it can also run on its own:
+
+Usage: python alerts.py [--interval 60] [--once]
+"""
+import argparse
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+from streamlit.logger import get_logger
+
+from budgets import BUDGET_CRITICAL, BUDGET_WARNING, budget_evaluation_query, close_budget_periods
+from database import get_connection, transaction
+from profiling import traced
+
+logger = get_logger(__name__)
+
+ALERT_INTERVAL = 60             # seconds between background scans
+DUE_SOON_DAYS = 7
+DUE_URGENT_DAYS = 3
+
+# Every alert that should currently exist, one row per (user, kind, ref,
+# key). The key changes whenever an alert should be raised afresh: a new
+# due date, a new budget window or a higher severity.
+CURRENT_ALERTS = f'''
+    SELECT user_id, 'bill' AS kind, id AS ref_id,
+           due_date || ':' || level AS alert_key, level,
+           printf('%s ($%.2f) is due on %s', name, amount, due_date) AS message
+    FROM (SELECT *, CASE WHEN due_date <= date(:today, :urgent) THEN 'error'
+                         ELSE 'warning' END AS level
+          FROM bill_reminders
+          WHERE status = 'Pending' AND due_date <= date(:today, :soon))
+
+    UNION ALL
+    SELECT user_id, 'debt', id, due_date, 'error',
+           printf('Payment on %s ($%.2f minimum) is due on %s', name, minimum_payment, due_date)
+    FROM debts
+    WHERE status = 'Active' AND due_date <= date(:today, :soon)
+
+    UNION ALL
+    SELECT user_id, 'budget', id, window_start || ':' || level, level,
+           printf('%s (%s): You''ve used %.1f%% of your budget', category, period, used)
+    FROM ({budget_evaluation_query()})
+    WHERE level != 'ok'
+'''
+
+
+def scan_alerts(today=None):
+    """Reconcile the alerts table for all users; returns (added, resolved)."""
+    params = {
+        'today': today or time.strftime('%Y-%m-%d'),
+        'soon': f'+{DUE_SOON_DAYS} days',
+        'urgent': f'+{DUE_URGENT_DAYS} days',
+        'warning': BUDGET_WARNING,
+        'critical': BUDGET_CRITICAL,
+    }
+    # Budgets with rollover need last window's results frozen first
+    close_budget_periods(today=date.fromisoformat(params['today']))
+    with transaction() as conn:
+        resolved = conn.execute(f'''
+            DELETE FROM alerts
+            WHERE (user_id, kind, ref_id, alert_key) NOT IN (
+                SELECT user_id, kind, ref_id, alert_key FROM ({CURRENT_ALERTS}))''',
+            params).rowcount
+        added = conn.execute(f'''
+            INSERT INTO alerts (user_id, kind, ref_id, alert_key, level, message)
+            SELECT user_id, kind, ref_id, alert_key, level, message FROM ({CURRENT_ALERTS}) WHERE 1
+            ON CONFLICT (user_id, kind, ref_id, alert_key)
+            DO UPDATE SET message = excluded.message WHERE message IS NOT excluded.message''',
+            params).rowcount
+    return added, resolved
+
+@traced('db')
+def get_alerts(user_id, kind=None):
+    query = '''SELECT id, kind, ref_id, level, message, created_at
+               FROM alerts
+               WHERE user_id = ? AND dismissed = 0'''
+    params = [user_id]
+    if kind:
+        query += ' AND kind = ?'
+        params.append(kind)
+    query += ' ORDER BY created_at DESC, id DESC'
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return df
+
+@traced('db')
+def dismiss_alert(alert_id):
+    # Dismissed alerts stay in the table so the scan does not raise them
+    # again until their key changes
+    with transaction() as conn:
+        conn.execute('UPDATE alerts SET dismissed = 1 WHERE id = ?', (alert_id,))
+
+
+class AlertScheduler(threading.Thread):
+    """Daemon thread that rescans alerts every ``interval`` seconds."""
+
+    def __init__(self, interval=ALERT_INTERVAL):
+        super().__init__(name='lucrum-alerts', daemon=True)
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                scan_alerts()
+            except Exception:
+                # Keep the scheduler alive; the next scan will retry
+                logger.exception("Alert scan failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def wake(self):
+        # Scan now instead of waiting for the next interval
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+@st.cache_resource
+def start_alert_scheduler(interval=ALERT_INTERVAL):
+    # One scanner per process, shared by every session
+    scheduler = AlertScheduler(interval)
+    scheduler.start()
+    return scheduler
+
+
+def main():
+    from schema import ensure_schema
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interval', type=float, default=ALERT_INTERVAL)
+    parser.add_argument('--once', action='store_true', help='run a single scan and exit')
+    args = parser.parse_args()
+
+    ensure_schema()
+    while True:
+        started = time.perf_counter()
+        added, resolved = scan_alerts()
+        print(f"{time.strftime('%H:%M:%S')} alerts: +{added} -{resolved} "
+              f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
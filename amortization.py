@@ -0,0 +1,242 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from profiling import traced
+
+# Month-by-month debt simulation on NumPy arrays. Every function accepts a
+# single plan as 1-D arrays of shape (debts,) or a batch of independent plans
+# (users or scenarios) as 2-D arrays of shape (plans, debts); shorter plans
+# are padded with zero balances. Each month every open debt accrues interest
+# and receives its minimum payment, then the rest of the monthly budget
+# (all original minimums plus any extra payment) goes to debts in priority
+# order, so the minimums of paid-off debts roll over to the next target.
+
+MAX_MONTHS = 360
+STRATEGIES = ["Avalanche", "Snowball", "Custom"]
+
+
+def payoff_order(balances, rates, strategy, custom_order=None):
+    """Column indices in the order extra payments should be applied.
+
+    Avalanche targets the highest interest rate first, Snowball the smallest
+    balance first, and Custom uses ``custom_order`` as given.
+    """
+    balances = np.atleast_2d(np.asarray(balances, dtype=float))
+    rates = np.atleast_2d(np.asarray(rates, dtype=float))
+    if strategy == "Avalanche":
+        # Stable sort so ties keep their original order
+        return np.argsort(-rates, axis=1, kind='stable')
+    if strategy == "Snowball":
+        # Padding (zero balance) sorts first but never receives money
+        return np.argsort(balances, axis=1, kind='stable')
+    if custom_order is None:
+        raise ValueError("Custom strategy needs an explicit order")
+    return np.broadcast_to(np.atleast_2d(custom_order), balances.shape)
+
+
+def simulate(balances, rates, minimums, extra=0.0, order=None,
+             max_months=MAX_MONTHS, keep_schedule=False):
+    """Simulate repayment of one or many debt plans.
+
+    ``rates`` are annual percentages, ``extra`` is a scalar or one value per
+    plan and ``order`` comes from payoff_order() (defaults to column order).
+    Returns a dict of arrays shaped like the inputs: ``payoff_month``
+    (1-based, 0 if not repaid within ``max_months``), ``interest`` per debt
+    and per plan ``months`` until debt-free (``max_months + 1`` if never).
+    With ``keep_schedule`` it also holds ``balance``, ``payment`` and
+    ``interest_paid`` arrays of shape (plans, months, debts).
+    """
+    single = np.ndim(balances) == 1
+    balance = np.atleast_2d(np.array(balances, dtype=float))
+    monthly_rate = np.atleast_2d(np.asarray(rates, dtype=float)) / 100 / 12
+    minimum = np.atleast_2d(np.asarray(minimums, dtype=float))
+    plans, debts = balance.shape
+    monthly_rate = np.broadcast_to(monthly_rate, balance.shape)
+    minimum = np.broadcast_to(minimum, balance.shape)
+
+    if order is None:
+        order = np.broadcast_to(np.arange(debts), balance.shape)
+    order = np.broadcast_to(np.atleast_2d(order), balance.shape)
+    rows = np.arange(plans)[:, None]
+
+    # Work in priority order so the extra payment cascade is a cumulative sum
+    balance = balance[rows, order]
+    monthly_rate = monthly_rate[rows, order]
+    minimum = np.where(balance > 0, minimum[rows, order], 0.0)
+    budget = minimum.sum(axis=1) + np.broadcast_to(np.asarray(extra, dtype=float), (plans,))
+
+    payoff_month = np.zeros((plans, debts), dtype=np.int32)
+    interest_total = np.zeros((plans, debts))
+    if keep_schedule:
+        balance_hist = np.zeros((plans, max_months, debts))
+        payment_hist = np.zeros((plans, max_months, debts))
+        interest_hist = np.zeros((plans, max_months, debts))
+
+    months = max_months
+    for month in range(max_months):
+        interest = balance * monthly_rate
+        balance = balance + interest
+        interest_total += interest
+
+        minimum_paid = np.minimum(minimum, balance)
+        balance = balance - minimum_paid
+        leftover = budget - minimum_paid.sum(axis=1)
+
+        # Each debt gets what is left after every higher-priority debt
+        ahead = np.cumsum(balance, axis=1) - balance
+        extra_paid = np.clip(leftover[:, None] - ahead, 0.0, balance)
+        balance = balance - extra_paid
+        # Anything under half a cent is paid off
+        balance[balance < 0.005] = 0.0
+
+        if keep_schedule:
+            balance_hist[:, month] = balance
+            payment_hist[:, month] = minimum_paid + extra_paid
+            interest_hist[:, month] = interest
+
+        paid_now = (balance == 0) & (payoff_month == 0) & ((minimum_paid + extra_paid) > 0)
+        payoff_month[paid_now] = month + 1
+        if not balance.any():
+            months = month + 1
+            break
+
+    # Back to the caller's column order
+    inverse = np.argsort(order, axis=1)
+    result = {
+        'payoff_month': payoff_month[rows, inverse],
+        'interest': interest_total[rows, inverse],
+        'months': np.where(balance.any(axis=1), max_months + 1, payoff_month.max(axis=1)),
+        'remaining': balance[rows, inverse],
+    }
+    if keep_schedule:
+        for key, history in (('balance', balance_hist), ('payment', payment_hist),
+                             ('interest_paid', interest_hist)):
+            result[key] = np.take_along_axis(history[:, :months], inverse[:, None, :], axis=2)
+    if single:
+        result = {key: value[0] for key, value in result.items()}
+    return result
+
+
+@traced('compute')
+def project_debts(debts_df, strategy="Avalanche", extra=0.0, custom_order=None,
+                  max_months=MAX_MONTHS, start=None):
+    """Full payoff projection for one user's debts (rows of get_debts()).
+
+    ``custom_order`` lists debt ids in priority order for the Custom
+    strategy. Returns ``(summary, schedule)``: one row per debt with its
+    payoff date and interest, and a long-form monthly schedule.
+    """
+    balances = debts_df['amount'].to_numpy(dtype=float)
+    rates = debts_df['interest_rate'].to_numpy(dtype=float)
+    minimums = debts_df['minimum_payment'].to_numpy(dtype=float)
+    if strategy == "Custom":
+        positions = {debt_id: i for i, debt_id in enumerate(debts_df['id'])}
+        custom_order = [positions[debt_id] for debt_id in custom_order]
+    order = payoff_order(balances, rates, strategy, custom_order)[0]
+
+    result = simulate(balances, rates, minimums, extra, order, max_months, keep_schedule=True)
+
+    start = pd.Timestamp(start or datetime.now()).to_period('M')
+    month_starts = pd.period_range(start + 1, periods=result['balance'].shape[0], freq='M').to_timestamp()
+    payoff = result['payoff_month']
+    # A debt that starts at zero is already paid: month 0, this month
+    already_paid = balances <= 0
+    summary = pd.DataFrame({
+        'id': debts_df['id'].to_numpy(),
+        'name': debts_df['name'].to_numpy(),
+        'payoff_month': np.where(already_paid, 0, np.where(payoff > 0, payoff, np.nan)),
+        'payoff_date': [start.to_timestamp() if paid else month_starts[m - 1] if m > 0 else pd.NaT
+                        for m, paid in zip(payoff, already_paid)],
+        'interest': result['interest'],
+    })
+    schedule = pd.DataFrame({
+        'month': np.repeat(month_starts, len(debts_df)),
+        'name': np.tile(debts_df['name'].to_numpy(), len(month_starts)),
+        'balance': result['balance'].ravel(),
+        'payment': result['payment'].ravel(),
+        'interest': result['interest_paid'].ravel(),
+    })
+    return summary, schedule
+
+
+@traced('compute')
+@st.cache_data(max_entries=32, show_spinner=False)
+def solve_scenarios(debts_df, extra_payments, strategies, rate_changes,
+                    custom_order=None, max_months=MAX_MONTHS):
+    """Evaluate every (extra payment, strategy, rate change) combination.
+
+    All scenarios run as one batch through simulate(). ``rate_changes`` are
+    percentage points added to every debt's rate. Results are memoized on
+    the debts snapshot and the grid, so re-rendering the tab is free.
+    Returns one row per scenario, sorted by total interest then months,
+    with ``pareto`` marking the paid-off scenarios on the Pareto front.
+    """
+    grid = pd.MultiIndex.from_product(
+        [list(extra_payments), list(strategies), list(rate_changes)],
+        names=['extra_payment', 'strategy', 'rate_change']).to_frame(index=False)
+    plans = len(grid)
+
+    balances = np.tile(debts_df['amount'].to_numpy(dtype=float), (plans, 1))
+    base_rates = debts_df['interest_rate'].to_numpy(dtype=float)
+    rates = np.clip(base_rates + grid['rate_change'].to_numpy()[:, None], 0.0, None)
+    minimums = debts_df['minimum_payment'].to_numpy(dtype=float)
+
+    if custom_order is not None:
+        positions = {debt_id: i for i, debt_id in enumerate(debts_df['id'])}
+        custom_order = [positions[debt_id] for debt_id in custom_order]
+    order = np.empty(balances.shape, dtype=int)
+    for strategy in grid['strategy'].unique():
+        rows = (grid['strategy'] == strategy).to_numpy()
+        order[rows] = payoff_order(balances[rows], rates[rows], strategy, custom_order)
+
+    result = simulate(balances, rates, minimums, grid['extra_payment'].to_numpy(dtype=float),
+                      order, max_months)
+    grid['months'] = result['months']
+    grid['total_interest'] = result['interest'].sum(axis=1)
+    grid['paid_off'] = grid['months'] <= max_months
+    # Best trade-offs between money put in each month, time and interest
+    grid['pareto'] = False
+    paid_off = grid['paid_off'].to_numpy()
+    grid.loc[paid_off, 'pareto'] = pareto_front(
+        grid.loc[paid_off, ['extra_payment', 'months', 'total_interest']])
+    return grid.sort_values(['paid_off', 'total_interest', 'months'],
+                            ascending=[False, True, True], ignore_index=True)
+
+
+def pareto_front(values):
+    """Mask of the rows of ``values`` (n x 3) on their Pareto front.
+
+    A row is on the front when no other row matches or beats it on every
+    column; identical rows share their fate. Rows are scanned sorted on all
+    three columns, so only earlier rows can dominate a later one. The
+    frontier so far is kept as a staircase over the last two columns
+    (second ascending, third strictly descending), and a row is dominated
+    when the staircase step at or before its second value is no worse on
+    the third.
+    """
+    values = np.asarray(values, dtype=float)
+    keep = np.zeros(len(values), dtype=bool)
+    rows = values.tolist()
+    seconds, thirds = [], []
+    previous = None
+    for i in np.lexsort(values.T[::-1]).tolist():
+        if previous is not None and rows[i] == rows[previous]:
+            keep[i] = keep[previous]
+            continue
+        previous = i
+        _, second, third = rows[i]
+        step = bisect_right(seconds, second)
+        if step and thirds[step - 1] <= third:
+            continue
+        keep[i] = True
+        # Steps this row now beats on both columns leave the staircase
+        start = end = bisect_left(seconds, second)
+        while end < len(thirds) and thirds[end] >= third:
+            end += 1
+        seconds[start:end] = [second]
+        thirds[start:end] = [third]
+    return keep
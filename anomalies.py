@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from database import get_connection
+from profiling import traced
+
+# Unusual-expense detection. category_stats holds a running count, mean and
+# sum of squared deviations (Welford) of every user's expenses per category,
+# updated in O(1) by the transaction triggers (and merged set-based for
+# imports). An expense more than ANOMALY_Z standard deviations above its
+# category's mean, as it stood before the expense, is recorded in the
+# anomalies table when it is inserted, so reading them is an index range
+# however long the history.
+
+ANOMALY_Z = 3.0
+MIN_OBSERVATIONS = 5            # expenses in a category before any is flagged
+RECENT_DAYS = 30
+
+# Condition on an expense amount ``x`` against category_stats ``s``, without
+# sqrt: (x - mean) / stddev > z with stddev**2 = m2 / (count - 1)
+IS_ANOMALY = '''s.count >= {min_count} AND s.m2 > 0 AND {{x}} > s.mean
+                AND ({{x}} - s.mean) * ({{x}} - s.mean) * (s.count - 1) > {z2} * s.m2'''.format(
+                    min_count=MIN_OBSERVATIONS, z2=ANOMALY_Z * ANOMALY_Z)
+
+def _with_scores(df):
+    df['stddev'] = np.sqrt(df.pop('variance'))
+    df['score'] = (df['amount'] - df['mean']) / df['stddev']
+    return df
+
+@traced('db')
+def get_anomalies(user_id, days=RECENT_DAYS, today=None):
+    """A user's flagged expenses of the last ``days`` days, newest first.
+
+    Columns: transaction_id, date, category, amount, mean and stddev (of the
+    category when the expense was added) and score (standard deviations
+    above that mean).
+    """
+    since = (today or date.today()) - timedelta(days=days)
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT transaction_id, date, category, amount, mean, variance
+            FROM anomalies
+            WHERE user_id = ? AND date >= ?
+            ORDER BY date DESC, transaction_id DESC''',
+            conn, params=(user_id, since.isoformat()), parse_dates=['date'])
+    return _with_scores(df)
+
+def get_anomaly(transaction_id):
+    # The anomaly recorded for one transaction as a row Series, or None
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT transaction_id, date, category, amount, mean, variance
+            FROM anomalies
+            WHERE transaction_id = ?''',
+            conn, params=(transaction_id,), parse_dates=['date'])
+    return None if df.empty else _with_scores(df).iloc[0]
@@ -0,0 +1,59 @@
+"""Time a bulk CSV statement import into a fresh database.
+
+Usage: python benchmarks/bench_import.py [--rows 100000]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--rows', type=int, default=100_000)
+args = parser.parse_args()
+
+tmp = tempfile.mkdtemp()
+os.environ['LUCRUM_DB'] = os.path.join(tmp, 'bench.db')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import create_user, authenticate_user
+from importer import import_transactions, read_csv_chunks
+from schema import ensure_schema
+
+
+def synthetic_csv(rows):
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+    lines = ['Date,Amount,Category,Description']
+    for i in range(rows):
+        day = start + timedelta(days=rng.randrange(3650))
+        amount = round(rng.uniform(-500, 500), 2) or 1.0
+        category = rng.choice(['Food', 'Transport', 'Bills', 'Salary', 'unknown'])
+        lines.append(f'{day.isoformat()},{amount},{category},Merchant {i % 997}')
+    # A few rows that must be rejected
+    lines += ['not a date,10,Food,bad', '2020-01-01,abc,Food,bad']
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+def main():
+    ensure_schema()
+    create_user('bench', 'bench')
+    user_id = authenticate_user('bench', 'bench')
+    categories = {'Income': ['Salary', 'Other Income'],
+                  'Expense': ['Food', 'Transport', 'Bills', 'Other Expenses']}
+    mapping = {'date': 'Date', 'amount': 'Amount', 'category': 'Category', 'description': 'Description'}
+
+    for label in ('first import', 're-import'):
+        statement = synthetic_csv(args.rows)
+        began = time.perf_counter()
+        summary = import_transactions(user_id, read_csv_chunks(statement), mapping, categories)
+        elapsed = time.perf_counter() - began
+        print(f'{label:<14} {elapsed:6.2f}s  inserted={summary["inserted"]:,} '
+              f'duplicates={summary["duplicates"]:,} rejected={len(summary["rejected"])}')
+
+
+if __name__ == '__main__':
+    main()
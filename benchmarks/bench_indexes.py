@@ -0,0 +1,95 @@
+"""Time the per-user query paths before and after the v2 index migration.
+
+Usage: python benchmarks/bench_indexes.py [--rows 1000000] [--users 1000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from schema import MIGRATIONS
+
+QUERIES = {
+    'get_transactions': '''SELECT id, date, type, amount, category, description
+                          FROM transactions WHERE user_id = ? ORDER BY date DESC''',
+    'get_debts': '''SELECT * FROM debts WHERE user_id = ? AND status = 'Active'
+                   ORDER BY due_date''',
+    'get_bill_reminders': '''SELECT * FROM bill_reminders WHERE user_id = ? AND status = 'Pending'
+                            ORDER BY due_date''',
+}
+
+
+def populate(conn, rows, users):
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+    categories = ['Food', 'Transport', 'Bills', 'Shopping', 'Salary', 'Housing']
+
+    def transactions():
+        for _ in range(rows):
+            day = start + timedelta(days=rng.randrange(3650))
+            yield (rng.randrange(1, users + 1), day.isoformat(),
+                   rng.choice(['Income', 'Expense']), round(rng.uniform(1, 500), 2),
+                   rng.choice(categories), None)
+
+    def dated_rows(count, statuses):
+        for i in range(count):
+            day = start + timedelta(days=rng.randrange(3650))
+            yield (rng.randrange(1, users + 1), f'item {i}', day.isoformat(), rng.choice(statuses))
+
+    conn.execute('BEGIN')
+    conn.executemany('''INSERT INTO transactions (user_id, date, type, amount, category, description)
+                        VALUES (?, ?, ?, ?, ?, ?)''', transactions())
+    conn.executemany('''INSERT INTO debts (user_id, name, type, amount, due_date, status)
+                        VALUES (?, ?, 'Other', 100, ?, ?)''',
+                     dated_rows(rows // 100, ['Active', 'Paid']))
+    conn.executemany('''INSERT INTO bill_reminders (user_id, name, amount, due_date, frequency, status)
+                        VALUES (?, ?, 50, ?, 'Monthly', ?)''',
+                     dated_rows(rows // 100, ['Pending', 'Paid']))
+    conn.execute('COMMIT')
+
+
+def time_queries(conn, users, samples):
+    rng = random.Random(7)
+    user_ids = [rng.randrange(1, users + 1) for _ in range(samples)]
+    results = {}
+    for name, sql in QUERIES.items():
+        began = time.perf_counter()
+        for user_id in user_ids:
+            conn.execute(sql, (user_id,)).fetchall()
+        results[name] = (time.perf_counter() - began) / samples * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'), isolation_level=None)
+        MIGRATIONS[0](conn)
+
+        print(f'Populating {args.rows:,} transactions for {args.users:,} users...')
+        populate(conn, args.rows, args.users)
+
+        before = time_queries(conn, args.users, args.samples)
+        for migration in MIGRATIONS[1:]:
+            migration(conn)
+        after = time_queries(conn, args.users, args.samples)
+        conn.close()
+
+    print(f'{"query":<22}{"before (ms)":>14}{"after (ms)":>14}{"speedup":>10}')
+    for name in QUERIES:
+        print(f'{name:<22}{before[name]:>14.2f}{after[name]:>14.2f}{before[name] / after[name]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
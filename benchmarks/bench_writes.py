@@ -0,0 +1,72 @@
+"""Concurrent-writer load test: one commit per write vs the group-commit queue.
+
+Usage: python benchmarks/bench_writes.py [--writers 32] [--writes 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--writers', type=int, default=32, help='concurrent sessions')
+parser.add_argument('--writes', type=int, default=200, help='inserts per session')
+args = parser.parse_args()
+
+tmp = tempfile.mkdtemp()
+os.environ['LUCRUM_DB'] = os.path.join(tmp, 'bench.db')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import add_transaction, create_user, authenticate_user, transaction
+from schema import ensure_schema
+
+
+def direct_insert(user_id, date, type_, amount, category, description):
+    # The previous write path: a transaction and commit per call
+    with transaction() as conn:
+        conn.execute('''INSERT INTO transactions (user_id, date, type, amount, category, description)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     (user_id, date, type_, amount, category, description))
+
+def queued_insert(*row):
+    add_transaction(*row).result()
+
+def run(label, insert, user_ids):
+    latencies = [[] for _ in user_ids]
+    errors = []
+
+    def session(n, user_id):
+        for i in range(args.writes):
+            started = time.perf_counter()
+            try:
+                insert(user_id, '2024-05-01', 'Expense', 1.0 + i, 'Food', f'{label} {i}')
+            except Exception as exc:
+                errors.append(exc)
+            latencies[n].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=session, args=(n, uid)) for n, uid in enumerate(user_ids)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ms = np.concatenate([np.array(l) for l in latencies]) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    print(f"{label:>7}: {len(ms) / elapsed:9,.0f} writes/s  "
+          f"p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  p99 {p99:6.2f} ms  errors {len(errors)}")
+
+
+ensure_schema()
+user_ids = []
+for n in range(args.writers):
+    create_user(f'writer{n}', 'pw')
+    user_ids.append(authenticate_user(f'writer{n}', 'pw'))
+
+print(f"{args.writers} writers x {args.writes} inserts")
+run('direct', direct_insert, user_ids)
+run('queued', queued_insert, user_ids)
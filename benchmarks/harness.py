@@ -0,0 +1,235 @@
+"""Headless load test for the Lucrum data layer.
+
+Seeds a fresh database with synthetic users, transactions, budgets, debts
+and bills, then runs N concurrent sessions that call the same data
+functions the tabs use, with a read-heavy mix of operations. Prints per-
+operation latency percentiles and throughput as JSON, so runs can be
+compared across versions.
+
+Usage: python benchmarks/harness.py [--rows 100000] [--users 100] [--sessions 8]
+                                    [--iterations 200] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--rows', type=int, default=100_000, help='transactions across all users')
+parser.add_argument('--users', type=int, default=100)
+parser.add_argument('--sessions', type=int, default=8, help='concurrent simulated sessions')
+parser.add_argument('--iterations', type=int, default=200, help='operations per session')
+parser.add_argument('--seed', type=int, default=42)
+parser.add_argument('--db', help='database path (default: a fresh temporary file)')
+parser.add_argument('--output', help='write the JSON report here instead of stdout')
+args = parser.parse_args()
+
+os.environ['LUCRUM_DB'] = args.db or os.path.join(tempfile.mkdtemp(), 'bench.db')
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+from amortization import project_debts
+from anomalies import get_anomalies
+from budgets import evaluate_budgets
+from database import (
+    add_bill_reminder, add_debt, add_transaction, get_bill_calendar,
+    get_bill_reminders, get_budgets, get_debts, get_transaction_page, get_transactions,
+    set_budget, transaction,
+)
+from forecast import forecast_all, get_forecast
+from importer import import_transactions
+from insights import get_insights
+from reports import (
+    OVERVIEW_PERIODS, category_totals, get_period_summary, get_rollup, monthly_totals,
+)
+from schema import SCHEMA_VERSION, ensure_schema
+
+EXPENSE_CATEGORIES = ['Food', 'Transport', 'Education', 'Entertainment', 'Shopping',
+                      'Bills', 'Healthcare', 'Housing', 'Other Expenses']
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Investments', 'Other Income']
+CATEGORIES = {'Income': INCOME_CATEGORIES, 'Expense': EXPENSE_CATEGORIES}
+MAPPING = {'date': 'Date', 'amount': 'Amount', 'category': 'Category', 'description': 'Description'}
+CHUNK_ROWS = 50_000
+
+
+def seed(rng):
+    """Populate users and their data; returns the user ids."""
+    with transaction() as conn:
+        conn.executemany('INSERT INTO users (username, password) VALUES (?, ?)',
+                         ((f'user{n}', 'pw') for n in range(args.users)))
+        user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+
+    # Transactions go through the statement importer, which is the fastest
+    # path in and leaves the rollup, change log and search index complete
+    days = pd.Timestamp.today().normalize() - pd.to_timedelta(np.arange(3 * 365), unit='D')
+    per_user = np.bincount(rng.integers(0, len(user_ids), args.rows), minlength=len(user_ids))
+    for user_id, count in zip(user_ids, per_user):
+        for start in range(0, count, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, count - start)
+            income = rng.random(n) < 0.2
+            chunk = pd.DataFrame({
+                'Date': days[rng.integers(0, len(days), n)].strftime('%Y-%m-%d'),
+                'Amount': np.where(income, 1, -1) * rng.uniform(1, 500, n).round(2),
+                'Category': np.where(income, rng.choice(INCOME_CATEGORIES, n),
+                                     rng.choice(EXPENSE_CATEGORIES, n)),
+                'Description': [f'Merchant {i}' for i in rng.integers(0, 1000, n)],
+            })
+            import_transactions(user_id, [chunk], MAPPING, CATEGORIES)
+
+    # Budgets, debts and bills are queued and committed in groups
+    today = pd.Timestamp.today()
+    futures = []
+    for user_id in user_ids:
+        for category in rng.choice(EXPENSE_CATEGORIES, 3, replace=False):
+            futures.append(set_budget(user_id, category, float(rng.integers(100, 1000)), 'Monthly'))
+        for i in range(int(rng.integers(1, 5))):
+            due = (today + pd.Timedelta(days=int(rng.integers(0, 30)))).strftime('%Y-%m-%d')
+            futures.append(add_debt(user_id, f'Debt {i}', 'Credit Card',
+                                    float(rng.integers(500, 20000)), float(rng.uniform(3, 25)),
+                                    float(rng.integers(25, 300)), due))
+        for i in range(int(rng.integers(1, 6))):
+            due = (today + pd.Timedelta(days=int(rng.integers(0, 60)))).strftime('%Y-%m-%d')
+            futures.append(add_bill_reminder(user_id, f'Bill {i}', float(rng.integers(20, 200)),
+                                             due, rng.choice(['Monthly', 'Weekly', 'Annually'])))
+    for future in futures:
+        future.result()
+    return user_ids
+
+
+def overview(user_id):
+    # What the Overview, Analysis and Reports tabs compute on a rerun
+    rollup = get_rollup(user_id)
+    get_period_summary(user_id, OVERVIEW_PERIODS[1])
+    monthly_totals(rollup, 'Expense')
+    monthly_totals(rollup, 'Income')
+    category_totals(rollup, 'Expense')
+    evaluate_budgets(user_id)
+
+# name -> (weight, operation(user_id, rng))
+OPERATIONS = {
+    'get_transactions': (10, lambda uid, rng: get_transactions(uid)),
+    'transaction_page': (10, lambda uid, rng: get_transaction_page(uid, 50)),
+    'transaction_search': (4, lambda uid, rng: get_transaction_page(uid, 50, search=f'Merchant {rng.integers(1000)}')),
+    # Terms that match a large share of every user's rows
+    'common_search': (4, lambda uid, rng: get_transaction_page(uid, 50, search=rng.choice(['food', 'shop', 'merchant']))),
+    'overview': (15, lambda uid, rng: overview(uid)),
+    'period_summary': (5, lambda uid, rng: get_period_summary(uid, rng.choice(OVERVIEW_PERIODS))),
+    'insights': (5, lambda uid, rng: get_insights(uid)),
+    'anomalies': (3, lambda uid, rng: get_anomalies(uid)),
+    'get_budgets': (5, lambda uid, rng: get_budgets(uid)),
+    'evaluate_budgets': (8, lambda uid, rng: evaluate_budgets(uid)),
+    'get_debts': (5, lambda uid, rng: get_debts(uid)),
+    'debt_projection': (3, lambda uid, rng: project_debts(get_debts(uid), 'Avalanche', 100.0)),
+    'get_bill_reminders': (5, lambda uid, rng: get_bill_reminders(uid)),
+    'bill_calendar': (3, lambda uid, rng: get_bill_calendar(uid)),
+    'forecast': (3, lambda uid, rng: get_forecast(uid)),
+    'set_budget': (2, lambda uid, rng: set_budget(uid, rng.choice(EXPENSE_CATEGORIES),
+                                                  float(rng.integers(100, 1000)), 'Monthly').result()),
+    'add_transaction': (5, lambda uid, rng: add_transaction(
+        uid, pd.Timestamp.today().strftime('%Y-%m-%d'), 'Expense', float(rng.uniform(1, 100)),
+        rng.choice(EXPENSE_CATEGORIES), 'load test').result()),
+}
+
+
+def run_sessions(user_ids):
+    names = list(OPERATIONS)
+    weights = np.array([OPERATIONS[name][0] for name in names], dtype=float)
+    weights /= weights.sum()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def session(n):
+        rng = np.random.default_rng(args.seed + n + 1)
+        local = defaultdict(list)
+        failed = defaultdict(int)
+        for name in rng.choice(names, args.iterations, p=weights):
+            user_id = int(rng.choice(user_ids))
+            started = time.perf_counter()
+            try:
+                OPERATIONS[name][1](user_id, rng)
+            except Exception:
+                failed[name] += 1
+                continue
+            local[name].append(time.perf_counter() - started)
+        with lock:
+            for name, values in local.items():
+                latencies[name].extend(values)
+            for name, count in failed.items():
+                errors[name] += count
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(args.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(values, elapsed):
+    ms = np.array(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()) if len(ms) else 0.0, 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'ops_per_sec': round(len(ms) / elapsed, 1),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    rng = np.random.default_rng(args.seed)
+    ensure_schema()
+
+    started = time.perf_counter()
+    user_ids = seed(rng)
+    seed_seconds = time.perf_counter() - started
+
+    latencies, errors, elapsed = run_sessions(user_ids)
+
+    # The nightly forecast batch over every seeded user
+    started = time.perf_counter()
+    forecast_all()
+    forecast_seconds = time.perf_counter() - started
+    report = {
+        'revision': git_revision(),
+        'schema_version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('db', 'output')},
+        'seed_seconds': round(seed_seconds, 2),
+        'elapsed_seconds': round(elapsed, 3),
+        'forecast_batch_seconds': round(forecast_seconds, 2),
+        'total': summarize([v for values in latencies.values() for v in values], elapsed),
+        'operations': {name: summarize(latencies[name], elapsed) for name in sorted(latencies)},
+        'errors': dict(errors),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
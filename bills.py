@@ -0,0 +1,74 @@
+from datetime import date
+
+import numpy as np
+
+# Recurrence rules for bill reminders. A bill's schedule is defined by its
+# anchor date (the first due date) and frequency. Month-based schedules keep
+# the anchor's day of month, clamped to the length of shorter months, so a
+# bill anchored on Jan 31 falls on Feb 28 (Feb 29 in leap years) and then
+# returns to Mar 31.
+
+FREQUENCIES = ["Monthly", "Weekly", "Quarterly", "Annually", "One-time"]
+FREQUENCY_MONTHS = {"Monthly": 1, "Quarterly": 3, "Annually": 12}
+CALENDAR_MONTHS = 12
+
+
+def _day(value):
+    return np.datetime64(value, 'D')
+
+def occurrence_dates(anchor, frequency, start, end):
+    """Due dates of a bill from ``start`` to ``end`` inclusive, as datetime64[D]."""
+    anchor, start, end = _day(anchor), _day(start), _day(end)
+    if end < start:
+        return np.array([], dtype='datetime64[D]')
+
+    if frequency == "Weekly":
+        first = max(0, -(-(start - anchor).astype(int) // 7))
+        last = (end - anchor).astype(int) // 7
+        return anchor + np.arange(first, last + 1) * 7
+
+    if frequency in FREQUENCY_MONTHS:
+        step = FREQUENCY_MONTHS[frequency]
+        anchor_month = anchor.astype('datetime64[M]')
+        anchor_day = (anchor - anchor_month.astype('datetime64[D]')).astype(int) + 1
+        first = max(0, (start.astype('datetime64[M]') - anchor_month).astype(int) // step)
+        last = (end.astype('datetime64[M]') - anchor_month).astype(int) // step
+        months = anchor_month + np.arange(first, last + 1) * step
+        month_starts = months.astype('datetime64[D]')
+        days_in_month = ((months + 1).astype('datetime64[D]') - month_starts).astype(int)
+        dates = month_starts + np.minimum(anchor_day, days_in_month) - 1
+        return dates[(dates >= start) & (dates <= end)]
+
+    # One-time
+    if start <= anchor <= end:
+        return np.array([anchor])
+    return np.array([], dtype='datetime64[D]')
+
+def next_due_date(anchor, frequency, after):
+    # First occurrence strictly after ``after``; None for one-time bills
+    if frequency not in FREQUENCY_MONTHS and frequency != "Weekly":
+        return None
+    after = _day(after)
+    return occurrence_dates(anchor, frequency, after + 1, after + 400)[0]
+
+def calendar_horizon(today=None):
+    # Last day covered by the materialized bill calendar
+    today = _day(today or date.today())
+    return (today.astype('datetime64[M]') + CALENDAR_MONTHS + 1).astype('datetime64[D]') - 1
+
+def materialize_bill(conn, bill_id, horizon):
+    # Replace a bill's rows in bill_occurrences with its schedule up to horizon
+    conn.execute('DELETE FROM bill_occurrences WHERE bill_id = ?', (bill_id,))
+    bill = conn.execute('''SELECT user_id, amount, due_date, anchor_date, frequency
+                           FROM bill_reminders
+                           WHERE id = ? AND status = ?''', (bill_id, 'Pending')).fetchone()
+    if bill is None:
+        return
+    user_id, amount, due_date, anchor_date, frequency = bill
+    dates = occurrence_dates(anchor_date or due_date, frequency, due_date, horizon)
+    if frequency == "One-time" or not len(dates):
+        # The current due date is always on the calendar, even past the horizon
+        dates = np.array([_day(due_date)])
+    conn.executemany('''INSERT INTO bill_occurrences (bill_id, user_id, due_date, amount)
+                        VALUES (?, ?, ?, ?)''',
+                     [(bill_id, user_id, str(day), amount) for day in dates])
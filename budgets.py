@@ -0,0 +1,221 @@
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+import pandas as pd
+
+from database import get_connection, transaction
+from profiling import traced
+
+# Budget evaluation. A budget applies to its period's current window (this
+# week, month or year) and keeps applying to later windows until it is set
+# again, so for each category and period the most recently set row is the
+# active one. Spending for every active budget is summed in one range join
+# against the (user_id, date) index on transactions, and the resulting
+# frame feeds the progress bars, the alerts and the RAO Bot alike.
+#
+# When a window closes its actuals are frozen into budget_period_results,
+# once, so history and rollover never rescan transactions for past windows.
+# A budget with rollover set adds the unspent part of its previous window's
+# limit to the current one.
+
+BUDGET_PERIODS = ["Monthly", "Weekly", "Yearly"]
+BUDGET_WARNING = 75             # percent of a budget used
+BUDGET_CRITICAL = 90
+HISTORY_PERIODS = 6             # closed windows in the trend view
+
+# Current window of each budget period, relative to :today
+WINDOW_START = '''CASE {period} WHEN 'Weekly' THEN date(:today, '-6 days', 'weekday 1')
+                                WHEN 'Monthly' THEN date(:today, 'start of month')
+                                ELSE date(:today, 'start of year') END'''
+WINDOW_END = '''CASE {period} WHEN 'Weekly' THEN date(:today, '-6 days', 'weekday 1', '+6 days')
+                              WHEN 'Monthly' THEN date(:today, 'start of month', '+1 month', '-1 day')
+                              ELSE date(:today, 'start of year', '+1 year', '-1 day') END'''
+
+def budget_evaluation_query(user_filter=''):
+    """SQL with one row per active budget: its window, limit, spending and level.
+
+    ``user_filter`` is an extra condition on the budgets table ``b``, e.g.
+    ``'AND b.user_id = :user_id'``; without it every user is evaluated.
+    Takes :today, :warning and :critical parameters.
+    """
+    return f'''
+        WITH active AS (
+            SELECT b.id, b.user_id, b.category, b.period, b.amount, b.rollover,
+                   {WINDOW_START.format(period='b.period')} AS window_start,
+                   {WINDOW_END.format(period='b.period')} AS window_end
+            FROM budgets b
+            WHERE b.start_date = (SELECT MAX(start_date) FROM budgets
+                                  WHERE user_id = b.user_id AND category = b.category
+                                    AND period = b.period)
+              {user_filter}
+        ),
+        carried AS (
+            -- Unspent limit of the frozen window that ended just before this one
+            SELECT a.*, amount + carried_in AS available
+            FROM (SELECT a.*,
+                         CASE WHEN a.rollover THEN COALESCE(
+                             (SELECT MAX(r.amount + r.carried_in - r.spent, 0)
+                              FROM budget_period_results r
+                              WHERE r.user_id = a.user_id AND r.category = a.category
+                                AND r.period = a.period
+                                AND r.window_end = date(a.window_start, '-1 day')), 0)
+                         ELSE 0 END AS carried_in
+                  FROM active a) a
+        ),
+        spent AS (
+            SELECT a.*, COALESCE(SUM(t.amount), 0) AS spent
+            FROM carried a
+            LEFT JOIN transactions t
+              ON t.user_id = a.user_id AND t.date BETWEEN a.window_start AND a.window_end
+             AND t.type = 'Expense' AND t.category = a.category
+            GROUP BY a.id
+        )
+        SELECT *,
+               CASE WHEN available > 0 THEN spent * 100.0 / available ELSE 0 END AS used,
+               CASE WHEN available <= 0 THEN 'ok'
+                    WHEN spent * 100.0 >= available * :critical THEN 'error'
+                    WHEN spent * 100.0 >= available * :warning THEN 'warning'
+                    ELSE 'ok' END AS level
+        FROM spent'''
+
+def period_window(period, today=None):
+    # (start, end) of the current window of a budget period, as dates
+    today = today or datetime.now()
+    if isinstance(today, datetime):
+        today = today.date()
+    if period == "Weekly":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if period == "Monthly":
+        start = today.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return today.replace(month=1, day=1), today.replace(month=12, day=31)
+
+def _closed_windows(period, first_day, today):
+    # Windows of a period from the one containing first_day up to, but not
+    # including, the current one
+    current, _ = period_window(period, today)
+    start, end = period_window(period, first_day)
+    while start < current:
+        yield start, end
+        start, end = period_window(period, end + timedelta(days=1))
+
+def close_budget_periods(user_id=None, today=None):
+    """Freeze spent vs limit for every budget window closed since the last run.
+
+    Each window is evaluated once, in one range join for all of them; later
+    calls only pick up windows that have closed since. Returns the number of
+    windows frozen.
+    """
+    today = today or datetime.now()
+    user_filter = 'WHERE b.user_id = ?' if user_id is not None else ''
+    with get_connection() as conn:
+        # Per budgeted (user, category, period): where its history starts
+        # and the last window already frozen
+        series = conn.execute(f'''
+            SELECT b.user_id, b.category, b.period, MIN(b.start_date),
+                   (SELECT MAX(window_end) FROM budget_period_results r
+                    WHERE r.user_id = b.user_id AND r.category = b.category
+                      AND r.period = b.period)
+            FROM budgets b
+            {user_filter}
+            GROUP BY b.user_id, b.category, b.period''',
+            () if user_id is None else (user_id,)).fetchall()
+
+    pending = []
+    for uid, category, period, first_start, last_frozen in series:
+        first_day = (date.fromisoformat(last_frozen) + timedelta(days=1) if last_frozen
+                     else date.fromisoformat(first_start))
+        pending.extend((uid, category, period, start.isoformat(), end.isoformat())
+                       for start, end in _closed_windows(period, first_day, today))
+    if not pending:
+        return 0
+
+    # Concurrent closers may find the same windows; the first insert wins
+    with transaction() as conn:
+        conn.execute('''CREATE TEMP TABLE IF NOT EXISTS closing_windows (
+                            user_id INTEGER, category TEXT, period TEXT,
+                            window_start TEXT, window_end TEXT)''')
+        conn.execute('DELETE FROM closing_windows')
+        conn.executemany('INSERT INTO closing_windows VALUES (?, ?, ?, ?, ?)', pending)
+
+        # The limit of a window is the budget most recently set by its end
+        rows = conn.execute('''
+            SELECT w.user_id, w.category, w.period, w.window_start, w.window_end,
+                   b.amount, b.rollover, COALESCE(SUM(t.amount), 0) AS spent,
+                   (SELECT r.amount + r.carried_in - r.spent FROM budget_period_results r
+                    WHERE r.user_id = w.user_id AND r.category = w.category
+                      AND r.period = w.period
+                      AND r.window_end = date(w.window_start, '-1 day')) AS left_over
+            FROM closing_windows w
+            JOIN budgets b
+              ON b.user_id = w.user_id AND b.category = w.category AND b.period = w.period
+             AND b.start_date = (SELECT MAX(start_date) FROM budgets
+                                 WHERE user_id = w.user_id AND category = w.category
+                                   AND period = w.period AND start_date <= w.window_end)
+            LEFT JOIN transactions t
+              ON t.user_id = w.user_id AND t.date BETWEEN w.window_start AND w.window_end
+             AND t.type = 'Expense' AND t.category = w.category
+            GROUP BY w.user_id, w.category, w.period, w.window_start
+            ORDER BY w.user_id, w.category, w.period, w.window_start''').fetchall()
+
+        # Rollover chains window to window, so carry it forward in order
+        frozen = []
+        for _, windows in groupby(rows, key=lambda row: row[:3]):
+            left_over = None
+            for uid, category, period, start, end, amount, rollover, spent, previous in windows:
+                if left_over is None:
+                    left_over = previous or 0
+                carried_in = max(left_over, 0) if rollover else 0
+                frozen.append((uid, category, period, start, end, amount, carried_in, spent))
+                left_over = amount + carried_in - spent
+        conn.executemany('''INSERT OR IGNORE INTO budget_period_results
+                              (user_id, category, period, window_start, window_end,
+                               amount, carried_in, spent)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', frozen)
+    return len(frozen)
+
+@traced('db')
+def evaluate_budgets(user_id, today=None):
+    """Spent vs limit for each of a user's active budgets, across all periods.
+
+    Columns: id, category, period, amount, rollover, window_start,
+    window_end, carried_in (unspent limit rolled over from the previous
+    window), available (amount plus carried_in), spent, used (percent of
+    available) and level ('ok', 'warning' or 'error').
+    """
+    close_budget_periods(user_id, today)
+    with get_connection() as conn:
+        df = pd.read_sql_query(
+            budget_evaluation_query('AND b.user_id = :user_id') + ' ORDER BY period, category',
+            conn, params={
+                'user_id': user_id,
+                'today': (today or datetime.now()).strftime('%Y-%m-%d'),
+                'warning': BUDGET_WARNING,
+                'critical': BUDGET_CRITICAL,
+            })
+    return df.drop(columns='user_id')
+
+@traced('db')
+def get_budget_history(user_id, period, periods=HISTORY_PERIODS, today=None):
+    """Frozen results of a user's last ``periods`` closed windows of a period.
+
+    One row per category and window, oldest first, with the same amount,
+    carried_in, available, spent and used columns as evaluate_budgets plus
+    within (spent no more than available).
+    """
+    close_budget_periods(user_id, today)
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT category, window_start, window_end, amount, carried_in,
+                   amount + carried_in AS available, spent
+            FROM budget_period_results
+            WHERE user_id = ? AND period = ?
+              AND window_start IN (SELECT DISTINCT window_start FROM budget_period_results
+                                   WHERE user_id = ? AND period = ?
+                                   ORDER BY window_start DESC LIMIT ?)
+            ORDER BY window_start, category''',
+            conn, params=(user_id, period, user_id, period, periods))
+    df['used'] = (df['spent'] * 100 / df['available'].where(df['available'] > 0)).fillna(0)
+    df['within'] = df['spent'] <= df['available']
+    return df
@@ -0,0 +1,723 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+from streamlit.logger import get_logger
+
+from bills import calendar_horizon, materialize_bill, next_due_date
+from profiling import ENABLED as PROFILING, count_statement, traced
+
+DB_PATH = os.environ.get('LUCRUM_DB', 'finance.db')
+POOL_SIZE = 8
+CACHED_USERS = 256
+WRITE_BATCH = 512     # most queued writes folded into one commit
+
+logger = get_logger(__name__)
+
+TRANSACTION_TYPES = pd.CategoricalDtype(['Income', 'Expense'])
+
+# Applied once to every pooled connection when it is opened
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -65536',     # 64 MiB page cache
+    'PRAGMA mmap_size = 268435456',   # 256 MiB memory-mapped reads
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+class ConnectionPool:
+    """A small pool of long-lived SQLite connections shared by all sessions.
+
+    Connections are opened lazily up to ``size`` and handed out one caller
+    at a time, so page cache and prepared statements survive across reruns.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if PROFILING:
+            conn.set_trace_callback(count_statement)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            grow = self._opened < self.size
+            if grow:
+                self._opened += 1
+        if grow:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # Pool exhausted, wait for another caller to hand a connection back
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+@st.cache_resource
+def get_pool(path=DB_PATH):
+    return ConnectionPool(path)
+
+
+@contextmanager
+def get_connection():
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    # Take the write lock up front so concurrent writers queue on busy_timeout
+    # instead of failing when a read transaction tries to upgrade
+    with get_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+@contextmanager
+def snapshot():
+    # Run several reads against one consistent view of the database
+    with get_connection() as conn:
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+
+class TransactionCache:
+    """Per-user, already-typed transaction frames shared by all sessions.
+
+    Each frame remembers the transaction_changes sequence it reflects. Writes
+    bump the user's version, which marks the frame stale, and the next read
+    only pulls the rows changed since that sequence. A refresh that raced a
+    write is stored under the version it started with, so it stays stale and
+    the newer write is picked up on the following read. Anything derived
+    from a user's transactions can key itself on ``version`` and register a
+    listener to hear about writes.
+    """
+
+    def __init__(self, max_users=CACHED_USERS):
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        # Returns (frame, seq, fresh, version); frame is None when not cached
+        with self._lock:
+            version = self._versions.get(user_id, 0)
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None, 0, False, version
+            self._entries.move_to_end(user_id)
+            frame, seq, entry_version = entry
+            return frame, seq, entry_version == version, version
+
+    def put(self, user_id, frame, seq, version):
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is not None and current[1] > seq:
+                return
+            self._entries[user_id] = (frame, seq, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(user_id)
+
+    def add_listener(self, listener):
+        # listener(user_id) is called after every write to that user's rows
+        with self._lock:
+            self._listeners.append(listener)
+
+
+@st.cache_resource
+def get_transaction_cache():
+    return TransactionCache()
+
+
+class WriteQueue:
+    """A single writer thread that applies queued writes in group commits.
+
+    Callers submit a function taking an open connection and get a Future
+    back. Whatever is pending when the writer comes around (up to
+    ``max_batch`` writes) runs inside one BEGIN IMMEDIATE ... COMMIT, each
+    write in its own savepoint so a failing one is rolled back alone. While
+    a commit is in flight new writes pile up and go out together in the next
+    one, so batches grow with load. Futures resolve, and ``on_commit``
+    callbacks run, only after the batch has committed.
+    """
+
+    def __init__(self, pool, max_batch=WRITE_BATCH):
+        self.pool = pool
+        self.max_batch = max_batch
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='lucrum-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, write, *args, on_commit=None):
+        future = Future()
+        self._pending.put((write, args, on_commit, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self._pending.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        # Drop writes whose callers cancelled them while they were queued
+        return [item for item in batch if item[3].set_running_or_notify_cancel()]
+
+    def _apply(self, batch):
+        # Returns one (result, error) pair per write
+        conn = self.pool.acquire()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            outcomes = []
+            for write, args, _, _ in batch:
+                conn.execute('SAVEPOINT queued_write')
+                try:
+                    outcomes.append((write(conn, *args), None))
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO queued_write')
+                    outcomes.append((None, exc))
+                conn.execute('RELEASE queued_write')
+            conn.execute('COMMIT')
+            return outcomes
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            return [(None, exc)] * len(batch)
+        finally:
+            self.pool.release(conn)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                outcomes = self._apply(batch)
+            except Exception as exc:
+                # Could not even get a connection; fail this batch, keep serving
+                outcomes = [(None, exc)] * len(batch)
+            for (_, _, on_commit, future), (result, error) in zip(batch, outcomes):
+                if error is not None:
+                    future.set_exception(error)
+                    continue
+                if on_commit is not None:
+                    try:
+                        on_commit()
+                    except Exception:
+                        # The write is committed either way; a failing
+                        # callback must not take the writer thread down
+                        logger.exception("on_commit callback failed")
+                future.set_result(result)
+
+
+@st.cache_resource
+def get_write_queue():
+    return WriteQueue(get_pool())
+
+
+def compact_change_log():
+    # Only the newest entry per transaction is needed to detect a change
+    with transaction() as conn:
+        conn.execute('''DELETE FROM transaction_changes WHERE seq NOT IN (
+                            SELECT MAX(seq) FROM transaction_changes
+                            GROUP BY user_id, transaction_id)''')
+
+
+# User functions
+def create_user(username, password):
+    with transaction() as conn:
+        conn.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                     (username, password))
+
+@traced('db')
+def authenticate_user(username, password):
+    with get_connection() as conn:
+        result = conn.execute('SELECT id FROM users WHERE username = ? AND password = ?',
+                              (username, password)).fetchone()
+    return result[0] if result else None
+
+@traced('db')
+def get_username(user_id):
+    with get_connection() as conn:
+        result = conn.execute('SELECT username FROM users WHERE id = ?', (user_id,)).fetchone()
+    return result[0] if result else None
+
+# Transaction functions
+def _transaction_owner(conn, transaction_id):
+    result = conn.execute('SELECT user_id FROM transactions WHERE id = ?',
+                          (transaction_id,)).fetchone()
+    return result[0] if result else None
+
+@traced('db')
+def delete_transaction(transaction_id):
+    with transaction() as conn:
+        user_id = _transaction_owner(conn, transaction_id)
+        conn.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+    get_transaction_cache().invalidate(user_id)
+
+@traced('db')
+def update_transaction(id, date, type_, amount, category):
+    with transaction() as conn:
+        user_id = _transaction_owner(conn, id)
+        conn.execute('''UPDATE transactions 
+                        SET date = ?, type = ?, amount = ?, category = ?
+                        WHERE id = ?''', (date, type_, amount, category, id))
+    get_transaction_cache().invalidate(user_id)
+
+def _read_transactions(conn, where, params, limit=None):
+    df = pd.read_sql_query(f'''
+        SELECT id, date, type, amount, category, description 
+        FROM transactions 
+        WHERE {where}
+        ORDER BY date DESC, id DESC
+        {f'LIMIT {int(limit)}' if limit else ''}''', 
+        conn, 
+        params=params)
+    df['date'] = pd.to_datetime(df['date'])
+    df['type'] = df['type'].astype(TRANSACTION_TYPES)
+    df['category'] = df['category'].astype('category')
+    return df
+
+@traced('db')
+def get_transaction(transaction_id):
+    # A single typed row, or None once it has been deleted
+    with get_connection() as conn:
+        df = _read_transactions(conn, 'id = ?', (transaction_id,))
+    return df.iloc[0] if len(df) else None
+
+def _latest_change(conn):
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM transaction_changes').fetchone()[0]
+
+def _load_transactions(user_id):
+    with snapshot() as conn:
+        seq = _latest_change(conn)
+        df = _read_transactions(conn, 'user_id = ?', (user_id,))
+    return df, seq
+
+def _merge_transactions(df, changed_ids, delta):
+    # Replace every changed row; ids that no longer come back were deleted
+    kept = df[~df['id'].isin(changed_ids)]
+    if delta.empty:
+        return kept.reset_index(drop=True)
+    if kept.empty:
+        return delta
+    new_categories = delta['category'].cat.categories.difference(kept['category'].cat.categories)
+    kept = kept.assign(category=kept['category'].cat.add_categories(new_categories))
+    delta = delta.assign(category=delta['category'].cat.set_categories(kept['category'].cat.categories))
+    merged = pd.concat([kept, delta], ignore_index=True)
+    return merged.sort_values(['date', 'id'], ascending=False, kind='stable', ignore_index=True)
+
+def _refresh_transactions(user_id, df, seq):
+    with snapshot() as conn:
+        latest = _latest_change(conn)
+        changed_ids = [row[0] for row in conn.execute('''
+            SELECT DISTINCT transaction_id FROM transaction_changes
+            WHERE user_id = ? AND seq > ?''', (user_id, seq))]
+        if not changed_ids:
+            return df, latest
+        delta = _read_transactions(conn, '''user_id = ? AND id IN (
+            SELECT transaction_id FROM transaction_changes
+            WHERE user_id = ? AND seq > ?)''', (user_id, user_id, seq))
+    return _merge_transactions(df, changed_ids, delta), latest
+
+@traced('db')
+def get_transactions(user_id):
+    cache = get_transaction_cache()
+    df, seq, fresh, version = cache.get(user_id)
+    if not fresh:
+        # Only rows changed since the cached sequence are read back
+        if df is None:
+            df, seq = _load_transactions(user_id)
+        else:
+            df, seq = _refresh_transactions(user_id, df, seq)
+        cache.put(user_id, df, seq, version)
+    # Shallow copy so callers can add columns without touching the shared frame
+    return df.copy(deep=False)
+
+# The trigram tokenizer can only match terms of at least this many characters
+MIN_SEARCH_LENGTH = 3
+# Search index rows are keyed (user_id << SEARCH_ID_BITS) + transaction id,
+# so one user's matches are a single rowid range of the index
+SEARCH_ID_BITS = 32
+
+def _search_clause(user_id, search):
+    terms = search.split()
+    if all(len(term) >= MIN_SEARCH_LENGTH for term in terms):
+        # Each term must appear somewhere in the description or category;
+        # the rowid range keeps other users' matches out of the lookup
+        query = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        first = user_id << SEARCH_ID_BITS
+        return ('''id IN (SELECT rowid - ? FROM transactions_fts
+                          WHERE transactions_fts MATCH ? AND rowid BETWEEN ? AND ?)''',
+                [first, query, first, first + (1 << SEARCH_ID_BITS) - 1])
+
+    # Terms too short for the index fall back to a scan of the user's rows
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f'%{escaped}%'
+    return ("(description LIKE ? ESCAPE '\\' OR category LIKE ? ESCAPE '\\')",
+            [pattern, pattern])
+
+def transaction_filters(user_id, types=None, start_date=None, end_date=None, search=None):
+    # Compile the Transactions tab filters into a parameterized WHERE clause
+    clauses = ['user_id = ?']
+    params = [user_id]
+    if types:
+        clauses.append(f"type IN ({', '.join('?' * len(types))})")
+        params.extend(types)
+    if start_date:
+        clauses.append('date >= ?')
+        params.append(start_date)
+    if end_date:
+        clauses.append('date <= ?')
+        params.append(end_date)
+    if search and search.strip():
+        clause, search_params = _search_clause(user_id, search.strip())
+        clauses.append(clause)
+        params.extend(search_params)
+    return ' AND '.join(clauses), params
+
+@traced('db')
+def get_transaction_page(user_id, page_size, cursor=None, **filters):
+    """One page of a user's transactions, newest first.
+
+    ``cursor`` is the (date, id) of the last row of the previous page and the
+    page starts strictly after it, so deep pages cost the same as the first.
+    ``filters`` are passed to transaction_filters(). Returns
+    ``(page, next_cursor)``; next_cursor is None on the last page.
+    """
+    where, params = transaction_filters(user_id, **filters)
+    if cursor:
+        where += ' AND (date, id) < (?, ?)'
+        params.extend(cursor)
+
+    # One extra row tells us whether another page follows
+    with get_connection() as conn:
+        df = _read_transactions(conn, where, params, limit=page_size + 1)
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (last['date'].strftime("%Y-%m-%d"), int(last['id']))
+    return df, next_cursor
+
+def _insert_transaction(conn, user_id, date, type_, amount, category, description):
+    return conn.execute('''INSERT INTO transactions (user_id, date, type, amount, category, description)
+                           VALUES (?, ?, ?, ?, ?, ?)''', 
+                        (user_id, date, type_, amount, category, description)).lastrowid
+
+@traced('db')
+def add_transaction(user_id, date, type_, amount, category, description):
+    """Queue a new transaction; returns a Future for its id, set once committed."""
+    cache = get_transaction_cache()
+    return get_write_queue().submit(_insert_transaction, user_id, date, type_, amount,
+                                    category, description,
+                                    on_commit=lambda: cache.invalidate(user_id))
+
+def _record_payment(conn, user_id, payment_key, amount, category, description):
+    # Claim the payment key and book the expense on the caller's transaction;
+    # the insert triggers update the change log, rollup and search index in
+    # the same commit. Returns None if the key was already claimed.
+    claimed = conn.execute('''INSERT OR IGNORE INTO payments (user_id, payment_key)
+                              VALUES (?, ?)''', (user_id, payment_key)).rowcount
+    if not claimed:
+        return None
+    transaction_id = conn.execute('''INSERT INTO transactions
+                                     (user_id, date, type, amount, category, description)
+                                     VALUES (?, ?, 'Expense', ?, ?, ?)''',
+                                  (user_id, datetime.now().strftime("%Y-%m-%d"),
+                                   amount, category, description)).lastrowid
+    conn.execute('''UPDATE payments SET transaction_id = ?
+                    WHERE user_id = ? AND payment_key = ?''',
+                 (transaction_id, user_id, payment_key))
+    return transaction_id
+
+# Budget functions
+def _upsert_budget(conn, user_id, category, amount, period, start_date, end_date, rollover):
+    # Without an explicit rollover the budget follows its period's setting,
+    # which set_budget_rollover keeps the same on all of the period's rows
+    conn.execute('''INSERT OR REPLACE INTO budgets 
+                    (user_id, category, amount, period, start_date, end_date, rollover)
+                    VALUES (?, ?, ?, ?, ?, ?,
+                            COALESCE(?, (SELECT MAX(rollover) FROM budgets
+                                         WHERE user_id = ? AND period = ?), 0))''', 
+                 (user_id, category, amount, period, start_date, end_date,
+                  rollover, user_id, period))
+
+def _set_budget_rollover(conn, user_id, period, rollover):
+    conn.execute('''UPDATE budgets SET rollover = ?
+                    WHERE user_id = ? AND period = ? AND rollover != ?''',
+                 (int(rollover), user_id, period, int(rollover)))
+
+@traced('db')
+def set_budget(user_id, category, amount, period, rollover=None):
+    # Queued like add_transaction; returns a Future
+    # Calculate start and end dates based on period
+    today = datetime.now()
+    if period == "Weekly":
+        start_date = today - timedelta(days=today.weekday())
+        end_date = start_date + timedelta(days=6)
+    elif period == "Monthly":
+        start_date = today.replace(day=1)
+        next_month = today.replace(day=28) + timedelta(days=4)
+        end_date = next_month.replace(day=1) - timedelta(days=1)
+    else:  # Yearly
+        start_date = today.replace(month=1, day=1)
+        end_date = today.replace(month=12, day=31)
+    
+    return get_write_queue().submit(_upsert_budget, user_id, category, amount, period,
+                                    start_date.strftime("%Y-%m-%d"),
+                                    end_date.strftime("%Y-%m-%d"), rollover)
+
+@traced('db')
+def set_budget_rollover(user_id, period, rollover):
+    # Carry unspent amounts forward for every budget of a period; returns a Future
+    return get_write_queue().submit(_set_budget_rollover, user_id, period, rollover)
+
+@traced('db')
+def get_budgets(user_id, period=None):
+    query = '''
+        SELECT category, amount, period, start_date, end_date
+        FROM budgets
+        WHERE user_id = ?
+    '''
+    params = [user_id]
+    
+    if period:
+        query += ' AND period = ?'
+        params.append(period)
+    
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return df
+
+# Debt management functions
+def _insert_debt(conn, user_id, name, type_, amount, interest_rate, minimum_payment, due_date):
+    return conn.execute('''INSERT INTO debts (user_id, name, type, amount, interest_rate, 
+                           minimum_payment, due_date, status)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, 'Active')''', 
+                        (user_id, name, type_, amount, interest_rate, minimum_payment,
+                         due_date)).lastrowid
+
+@traced('db')
+def add_debt(user_id, name, type_, amount, interest_rate, minimum_payment, due_date):
+    # Queued like add_transaction; returns a Future for the debt id
+    return get_write_queue().submit(_insert_debt, user_id, name, type_, amount,
+                                    interest_rate, minimum_payment, due_date)
+
+@traced('db')
+def get_debts(user_id):
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT *, CAST(julianday(due_date) - julianday('now', 'localtime', 'start of day')
+                           AS INTEGER) AS days_left
+            FROM debts 
+            WHERE user_id = ? AND status = 'Active'
+            ORDER BY due_date''', 
+            conn, params=(user_id,))
+    return df
+
+@traced('db')
+def update_debt(debt_id, amount):
+    with transaction() as conn:
+        conn.execute('UPDATE debts SET amount = ? WHERE id = ?', (amount, debt_id))
+
+@traced('db')
+def mark_debt_paid(user_id, debt_id, payment_key=None):
+    """Close a debt and record its payoff as an expense, in one transaction.
+
+    Returns the new transaction id, or None when the debt was not found or
+    the payment key was already used (e.g. a repeated click).
+    """
+    with transaction() as conn:
+        debt = conn.execute('''SELECT name, amount FROM debts
+                               WHERE id = ? AND user_id = ? AND status = ?''',
+                            (debt_id, user_id, 'Active')).fetchone()
+        if debt is None:
+            return None
+        name, amount = debt
+        transaction_id = _record_payment(conn, user_id, payment_key or f"debt:{debt_id}",
+                                         amount, "Debt Payment", f"Paid off: {name}")
+        if transaction_id is not None:
+            conn.execute("UPDATE debts SET status = 'Paid' WHERE id = ?", (debt_id,))
+    get_transaction_cache().invalidate(user_id)
+    return transaction_id
+
+# Bill reminder functions
+def _insert_bill_reminder(conn, user_id, name, amount, due_date, frequency):
+    bill_id = conn.execute('''INSERT INTO bill_reminders 
+                              (user_id, name, amount, due_date, anchor_date, frequency, status)
+                              VALUES (?, ?, ?, ?, ?, ?, 'Pending')''',
+                           (user_id, name, amount, due_date, due_date, frequency)).lastrowid
+    materialize_bill(conn, bill_id, calendar_horizon())
+    return bill_id
+
+@traced('db')
+def add_bill_reminder(user_id, name, amount, due_date, frequency):
+    # Queued like add_transaction; returns a Future for the reminder id
+    return get_write_queue().submit(_insert_bill_reminder, user_id, name, amount,
+                                    due_date, frequency)
+
+@traced('db')
+def get_bill_reminders(user_id):
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT *, CAST(julianday(due_date) - julianday('now', 'localtime', 'start of day')
+                           AS INTEGER) AS days_left
+            FROM bill_reminders 
+            WHERE user_id = ? AND status = 'Pending'
+            ORDER BY due_date''',
+            conn, params=(user_id,))
+    return df
+
+@traced('db')
+def mark_bill_paid(user_id, reminder_id, payment_key=None):
+    """Pay a bill's current occurrence and record it as an expense, in one transaction.
+
+    Recurring bills roll forward to their next occurrence; one-time bills are
+    closed. The default payment key is the occurrence's due date, so paying
+    the same occurrence twice is a no-op. Returns the new transaction id, or
+    None when nothing was paid.
+    """
+    with transaction() as conn:
+        bill = conn.execute('''SELECT name, amount, due_date, anchor_date, frequency
+                               FROM bill_reminders
+                               WHERE id = ? AND user_id = ? AND status = ?''',
+                            (reminder_id, user_id, 'Pending')).fetchone()
+        if bill is None:
+            return None
+        name, amount, due_date, anchor_date, frequency = bill
+        transaction_id = _record_payment(conn, user_id, payment_key or f"bill:{reminder_id}:{due_date}",
+                                         amount, "Bills", f"Paid: {name}")
+        if transaction_id is not None:
+            next_due = next_due_date(anchor_date or due_date, frequency, due_date)
+            if next_due is None:
+                conn.execute("UPDATE bill_reminders SET status = 'Paid' WHERE id = ?", (reminder_id,))
+            else:
+                conn.execute("UPDATE bill_reminders SET due_date = ? WHERE id = ?",
+                             (str(next_due), reminder_id))
+            materialize_bill(conn, reminder_id, calendar_horizon())
+    get_transaction_cache().invalidate(user_id)
+    return transaction_id
+
+@traced('db')
+def update_bill_reminder(reminder_id, name, amount, due_date, frequency):
+    # Editing the due date restarts the schedule from it
+    with transaction() as conn:
+        conn.execute('''UPDATE bill_reminders 
+                        SET name = ?, amount = ?, due_date = ?, anchor_date = ?, frequency = ?
+                        WHERE id = ?''', 
+                     (name, amount, due_date, due_date, frequency, reminder_id))
+        materialize_bill(conn, reminder_id, calendar_horizon())
+
+def ensure_bill_calendar(user_id):
+    # bill_occurrences holds each pending bill's schedule up to a horizon a
+    # year out; once the stored horizon falls behind, rebuild the user's rows
+    horizon = str(calendar_horizon())
+    with get_connection() as conn:
+        row = conn.execute('SELECT horizon FROM bill_calendar WHERE user_id = ?',
+                           (user_id,)).fetchone()
+    if row is not None and row[0] >= horizon:
+        return
+    with transaction() as conn:
+        bill_ids = conn.execute('''SELECT id FROM bill_reminders
+                                   WHERE user_id = ? AND status = ?''',
+                                (user_id, 'Pending')).fetchall()
+        conn.execute('DELETE FROM bill_occurrences WHERE user_id = ?', (user_id,))
+        for (bill_id,) in bill_ids:
+            materialize_bill(conn, bill_id, horizon)
+        conn.execute('''INSERT INTO bill_calendar (user_id, horizon) VALUES (?, ?)
+                        ON CONFLICT (user_id) DO UPDATE SET horizon = excluded.horizon''',
+                     (user_id, horizon))
+
+@traced('db')
+def get_bills_due(user_id, days=7):
+    """Count and total of bill occurrences due within ``days`` (overdue included)."""
+    ensure_bill_calendar(user_id)
+    with get_connection() as conn:
+        count, total = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM bill_occurrences
+            WHERE user_id = ? AND due_date <= date('now', 'localtime', ?)''',
+            (user_id, f'+{int(days)} days')).fetchone()
+    return count, total
+
+@traced('db')
+def get_bill_calendar(user_id):
+    """Bill occurrences for the next twelve months, totalled per month."""
+    ensure_bill_calendar(user_id)
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT substr(due_date, 1, 7) AS year_month,
+                   SUM(amount) AS total, COUNT(*) AS bills
+            FROM bill_occurrences
+            WHERE user_id = ? AND due_date <= ?
+            GROUP BY year_month
+            ORDER BY year_month''',
+            conn, params=(user_id, str(calendar_horizon())))
+    return df.set_index('year_month')
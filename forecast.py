@@ -0,0 +1,320 @@
+"""Cash-flow forecast: each user's daily balance for the next 12 months.
+
+Three kinds of flows are projected onto a users x days grid with NumPy:
+recurring income and expenses detected in the last six months of
+transactions (plus the average of everything else, spread per day), the
+pending bill occurrences from the bill calendar, and minimum payments on
+active debts until they are paid off. The balance is the user's current
+net worth plus the running sum of the grid.
+
+A user's latest forecast is stored with the versions of its inputs: the
+newest transaction_changes sequence and a hash of the bill and debt
+schedule. A read that finds both unchanged returns the stored rows; if only
+bills or debts changed, only their flows are recomputed. The nightly batch
+forecasts every user in chunks of a few hundred, with a handful of
+set-based reads per chunk:
+
+Usage: python forecast.py [--date YYYY-MM-DD] [--chunk 500]
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from bills import CALENDAR_MONTHS, calendar_horizon
+from database import ensure_bill_calendar, get_connection, get_write_queue, snapshot, transaction
+from profiling import traced
+
+LOOKBACK_MONTHS = 6
+MIN_OCCURRENCES = 3             # months a pattern must appear in to recur
+MAX_VARIATION = 0.2             # std / mean of a recurring amount
+BATCH_USERS = 500
+FLOWS = ['income', 'expenses', 'bills', 'debts']
+
+
+def _horizon(today):
+    # Forecast days, today through the end of the bill calendar
+    return np.arange(today, calendar_horizon(today) + 1)
+
+def _monthly_dates(first_month, anchor_day, months):
+    # anchor_day of each of ``months`` consecutive months from first_month,
+    # clamped to month ends; one row per anchor
+    months = first_month[:, None] + np.arange(months)
+    starts = months.astype('datetime64[D]')
+    lengths = ((months + 1).astype('datetime64[D]') - starts).astype(int)
+    return starts + np.minimum(anchor_day[:, None], lengths) - 1
+
+def _place(grid, rows, dates, amounts, days):
+    # Add amounts to the grid cells of their (user row, date); dates outside
+    # the horizon are dropped
+    index = (dates - days[0]).astype(int)
+    keep = (index >= 0) & (index < len(days))
+    np.add.at(grid, (rows[keep], index[keep]), amounts[keep])
+
+
+def _load_transactions(conn, lo, hi, today):
+    # Net worth so far, and the lookback window of transactions; payments
+    # booked for bills and debts are left out since their schedules are
+    # forecast separately
+    since = str((today.astype('datetime64[M]') - LOOKBACK_MONTHS).astype('datetime64[D]'))
+    balances = pd.read_sql_query('''
+        SELECT user_id, SUM(CASE type WHEN 'Income' THEN total ELSE -total END) AS balance
+        FROM monthly_rollup
+        WHERE user_id BETWEEN ? AND ?
+        GROUP BY user_id''', conn, params=(lo, hi))
+    recent = pd.read_sql_query('''
+        SELECT user_id, date, type, amount, category, description
+        FROM transactions
+        WHERE user_id BETWEEN ? AND ? AND date >= ? AND date < ?
+          AND id NOT IN (SELECT transaction_id FROM payments
+                         WHERE user_id BETWEEN ? AND ? AND transaction_id IS NOT NULL)''',
+        conn, params=(lo, hi, since, str(today), lo, hi))
+    return balances, recent, (today - np.datetime64(since)).astype(int)
+
+def _load_schedule(conn, lo, hi, days):
+    bills = pd.read_sql_query('''
+        SELECT user_id, due_date, amount
+        FROM bill_occurrences
+        WHERE user_id BETWEEN ? AND ? AND due_date <= ?
+        ORDER BY user_id, due_date, bill_id''', conn, params=(lo, hi, str(days[-1])))
+    debts = pd.read_sql_query('''
+        SELECT user_id, amount, interest_rate, minimum_payment, due_date
+        FROM debts
+        WHERE user_id BETWEEN ? AND ? AND status = 'Active'
+        ORDER BY user_id, id''', conn, params=(lo, hi))
+    return bills, debts
+
+def _versions(conn, lo, hi):
+    # Newest change log entry per user; it survives log compaction
+    return dict(conn.execute('''SELECT user_id, MAX(seq) FROM transaction_changes
+                                WHERE user_id BETWEEN ? AND ?
+                                GROUP BY user_id''', (lo, hi)).fetchall())
+
+def _schedule_hashes(users, bills, debts):
+    # Order-independent hash of each user's bill and debt inputs
+    hashes = np.zeros(len(users), dtype=np.uint64)
+    for frame in (bills, debts):
+        if not frame.empty:
+            rows = np.searchsorted(users, frame['user_id'].to_numpy())
+            np.add.at(hashes, rows, pd.util.hash_pandas_object(frame, index=False).to_numpy())
+    return [f'{h:016x}' for h in hashes]
+
+
+def _transaction_flows(users, recent, lookback_days, days):
+    """(income, expenses) grids from recurring patterns plus daily averages.
+
+    A (type, category, description) group is recurring when it shows up in
+    at least MIN_OCCURRENCES months of the lookback, about once a month, with
+    a steady amount; it is projected on its median day of the month at its
+    median amount. Everything else adds its daily average to every day.
+    """
+    income = np.zeros((len(users), len(days)))
+    expenses = np.zeros((len(users), len(days)))
+    if recent.empty:
+        return income, expenses
+
+    recent = recent.assign(month=recent['date'].str[:7],
+                           day=recent['date'].str[8:10].astype(int))
+    keys = ['user_id', 'type', 'category', 'description']
+    groups = recent.groupby(keys, sort=False)
+    stats = groups.agg(months=('month', 'nunique'), count=('amount', 'size'),
+                       amount=('amount', 'median'), mean=('amount', 'mean'),
+                       std=('amount', 'std'), day=('day', 'median'))
+    recurring = stats[(stats['months'] >= MIN_OCCURRENCES)
+                      & (stats['count'] <= stats['months'] * 1.25)
+                      & (stats['std'].fillna(0) <= MAX_VARIATION * stats['mean'])].reset_index()
+
+    first_month = np.full(len(recurring), days[0].astype('datetime64[M]'))
+    dates = _monthly_dates(first_month, recurring['day'].round().astype(int).to_numpy(),
+                           CALENDAR_MONTHS + 1)
+    rows = np.repeat(np.searchsorted(users, recurring['user_id'].to_numpy()), dates.shape[1])
+    amounts = np.repeat(recurring['amount'].to_numpy(), dates.shape[1])
+    is_income = np.repeat((recurring['type'] == 'Income').to_numpy(), dates.shape[1])
+    dates = dates.ravel()
+    _place(income, rows[is_income], dates[is_income], amounts[is_income], days)
+    _place(expenses, rows[~is_income], dates[~is_income], amounts[~is_income], days)
+
+    # The rest of the lookback, as an average per day
+    flagged = recent.merge(recurring[keys].assign(recurring=True), on=keys, how='left')
+    other = flagged[flagged['recurring'].isna()]
+    daily = (other.groupby(['user_id', 'type'])['amount'].sum() / lookback_days).unstack(fill_value=0)
+    daily = daily.reindex(index=users, columns=['Income', 'Expense'], fill_value=0)
+    income += daily['Income'].to_numpy()[:, None]
+    expenses += daily['Expense'].to_numpy()[:, None]
+    return income, expenses
+
+def _scheduled_flows(users, bills, debts, days):
+    """(bills, debts) grids from bill occurrences and debt minimum payments.
+
+    Overdue bills and payments fall due today. A debt is paid at its
+    minimum on its due day each month until the balance, with monthly
+    interest, is gone; the last payment is whatever remains.
+    """
+    bill_grid = np.zeros((len(users), len(days)))
+    debt_grid = np.zeros((len(users), len(days)))
+    if not bills.empty:
+        due = np.maximum(bills['due_date'].to_numpy().astype('datetime64[D]'), days[0])
+        _place(bill_grid, np.searchsorted(users, bills['user_id'].to_numpy()), due,
+               bills['amount'].to_numpy(), days)
+    if debts.empty:
+        return bill_grid, debt_grid
+
+    balance = debts['amount'].to_numpy()
+    payment = debts['minimum_payment'].to_numpy()
+    rate = debts['interest_rate'].to_numpy() / 1200
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Payments needed to clear the balance; infinite if the minimum
+        # never covers the interest
+        count = np.where(rate > 0, np.ceil(-np.log1p(-rate * balance / payment) / np.log1p(rate)),
+                         np.ceil(balance / payment))
+        count = np.where(payment > 0, np.nan_to_num(count, nan=np.inf), 0)
+        growth = (1 + rate) ** np.maximum(count - 1, 0)
+        left = np.where(rate > 0, balance * growth - payment * (growth - 1) / rate,
+                        balance - payment * np.maximum(count - 1, 0))
+        last = np.where(np.isfinite(count), left * (1 + rate), payment)
+
+    due = debts['due_date'].to_numpy().astype('datetime64[D]')
+    anchor_day = (due - due.astype('datetime64[M]').astype('datetime64[D]')).astype(int) + 1
+    first_month = np.maximum(due.astype('datetime64[M]'), days[0].astype('datetime64[M]'))
+    dates = _monthly_dates(first_month, anchor_day, CALENDAR_MONTHS + 2)
+    # A due date earlier this month is overdue, not next month's payment
+    dates[due < days[0], 0] = days[0]
+    number = np.arange(dates.shape[1])[None, :]
+    amounts = np.where(number < count[:, None] - 1, payment[:, None],
+                       np.where(number == count[:, None] - 1, last[:, None], 0))
+    rows = np.repeat(np.searchsorted(users, debts['user_id'].to_numpy()), dates.shape[1])
+    _place(debt_grid, rows, dates.ravel(), amounts.ravel(), days)
+    return bill_grid, debt_grid
+
+def _balances(start, income, expenses, bills, debts):
+    return start[:, None] + np.cumsum(income - expenses - bills - debts, axis=1)
+
+
+def _store(conn, runs, days, grids):
+    # Replace the stored forecast of every user in ``runs``
+    users = [run[0] for run in runs]
+    conn.executemany('DELETE FROM forecast_days WHERE user_id = ?', ((u,) for u in users))
+    conn.executemany('''INSERT OR REPLACE INTO forecast_runs
+                        (user_id, start_date, transactions_seq, schedule_hash, start_balance)
+                        VALUES (?, ?, ?, ?, ?)''', runs)
+    dates = days.astype(str)
+    conn.executemany('''INSERT INTO forecast_days
+                        (user_id, date, income, expenses, bills, debts, balance)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     ((user, day, *values)
+                      for row, user in enumerate(users)
+                      for day, *values in zip(dates, *(grid[row].tolist() for grid in grids))))
+
+def _frame(days, income, expenses, bills, debts, balance):
+    return pd.DataFrame({'income': income, 'expenses': expenses, 'bills': bills,
+                         'debts': debts, 'balance': balance},
+                        index=pd.DatetimeIndex(days, name='date'))
+
+@traced('compute')
+def get_forecast(user_id, today=None):
+    """A user's projected daily flows and balance for the next 12 months.
+
+    Indexed by date, with income, expenses, bills, debts and balance
+    columns. Served from the stored forecast while its inputs are unchanged.
+    """
+    today = np.datetime64(today or date.today(), 'D')
+    days = _horizon(today)
+    users = np.array([user_id])
+    ensure_bill_calendar(user_id)
+    with snapshot() as conn:
+        seq = _versions(conn, user_id, user_id).get(user_id, 0)
+        bills, debts = _load_schedule(conn, user_id, user_id, days)
+        schedule_hash = _schedule_hashes(users, bills, debts)[0]
+        run = conn.execute('''SELECT start_date, transactions_seq, schedule_hash, start_balance
+                              FROM forecast_runs WHERE user_id = ?''', (user_id,)).fetchone()
+        fresh = run is not None and run[0] == str(today) and run[1] == seq
+        if fresh:
+            stored = pd.read_sql_query('''
+                SELECT date, income, expenses, bills, debts, balance
+                FROM forecast_days
+                WHERE user_id = ?
+                ORDER BY date''', conn, params=(user_id,), parse_dates=['date'], index_col='date')
+            fresh = len(stored) == len(days)
+        if not fresh:
+            balances, recent, lookback_days = _load_transactions(conn, user_id, user_id, today)
+
+    if fresh and run[2] == schedule_hash:
+        return stored
+
+    if fresh:
+        # Only bills or debts changed; reuse the transaction-based flows
+        start = np.array([run[3]])
+        income = stored['income'].to_numpy()[None, :]
+        expenses = stored['expenses'].to_numpy()[None, :]
+    else:
+        start = np.array([balances['balance'].sum()])
+        income, expenses = _transaction_flows(users, recent, lookback_days, days)
+    bill_grid, debt_grid = _scheduled_flows(users, bills, debts, days)
+    grids = (income, expenses, bill_grid, debt_grid,
+             _balances(start, income, expenses, bill_grid, debt_grid))
+
+    # Stored in the background; the next read with the same inputs uses it
+    get_write_queue().submit(_store, [(user_id, str(today), seq, schedule_hash, float(start[0]))],
+                             days, grids)
+    return _frame(days, *(grid[0] for grid in grids))
+
+def forecast_all(today=None, chunk=BATCH_USERS, progress=None):
+    """Forecast and store every user's cash flow; returns the number of users.
+
+    ``progress`` is called with the number of users done so far.
+    """
+    today = np.datetime64(today or date.today(), 'D')
+    days = _horizon(today)
+    with get_connection() as conn:
+        all_users = np.array([row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')])
+        # Calendars that no longer reach the horizon are extended first
+        stale = [row[0] for row in conn.execute('''
+            SELECT DISTINCT b.user_id FROM bill_reminders b
+            LEFT JOIN bill_calendar c ON c.user_id = b.user_id
+            WHERE b.status = 'Pending' AND (c.horizon IS NULL OR c.horizon < ?)''',
+            (str(days[-1]),))]
+    for user_id in stale:
+        ensure_bill_calendar(user_id)
+
+    for start in range(0, len(all_users), chunk):
+        users = all_users[start:start + chunk]
+        lo, hi = int(users[0]), int(users[-1])
+        with snapshot() as conn:
+            seqs = _versions(conn, lo, hi)
+            balances, recent, lookback_days = _load_transactions(conn, lo, hi, today)
+            bills, debts = _load_schedule(conn, lo, hi, days)
+
+        income, expenses = _transaction_flows(users, recent, lookback_days, days)
+        bill_grid, debt_grid = _scheduled_flows(users, bills, debts, days)
+        opening = balances.set_index('user_id')['balance'].reindex(users, fill_value=0).to_numpy()
+        grids = (income, expenses, bill_grid, debt_grid,
+                 _balances(opening, income, expenses, bill_grid, debt_grid))
+        runs = [(int(user), str(today), seqs.get(int(user), 0), schedule_hash, float(balance))
+                for user, schedule_hash, balance
+                in zip(users, _schedule_hashes(users, bills, debts), opening)]
+        with transaction() as conn:
+            _store(conn, runs, days, grids)
+        if progress:
+            progress(start + len(users))
+    return len(all_users)
+
+
+def main():
+    from schema import ensure_schema
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--date', help='first forecast day (default: today)')
+    parser.add_argument('--chunk', type=int, default=BATCH_USERS, help='users per batch')
+    args = parser.parse_args()
+
+    ensure_schema()
+    started = time.perf_counter()
+    count = forecast_all(args.date, args.chunk,
+                         progress=lambda done: print(f"{done} users", end='\r', flush=True))
+    print(f"Forecast {count} users in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import codecs
+import hashlib
+import io
+import re
+import warnings
+
+import pandas as pd
+
+from anomalies import IS_ANOMALY
+from database import SEARCH_ID_BITS, get_transaction_cache, transaction
+from profiling import traced
+
+# Statement import: files are parsed in chunks, normalised with vectorised
+# pandas operations and written with executemany inside a single write
+# transaction. Each row carries a content hash, so importing the same
+# statement twice never duplicates transactions.
+
+CHUNK_SIZE = 10_000
+IMPORT_FIELDS = ('date', 'type', 'amount', 'category', 'description')
+DEFAULT_CATEGORIES = {'Income': 'Other Income', 'Expense': 'Other Expenses'}
+
+TYPE_ALIASES = {
+    'income': 'Income', 'credit': 'Income', 'cr': 'Income', 'deposit': 'Income',
+    'expense': 'Expense', 'debit': 'Expense', 'dr': 'Expense', 'withdrawal': 'Expense',
+    'payment': 'Expense',
+}
+
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+OFX_FIELD = re.compile(r'<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)', re.I)
+OFX_MAPPING = {'date': 'date', 'amount': 'amount', 'description': 'description'}
+
+
+def csv_encoding(file):
+    # UTF-8 (a BOM is dropped) when the whole file decodes as such, otherwise
+    # latin-1, which many bank exports use and which accepts any byte
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin-1'
+    finally:
+        file.seek(0)
+    return 'utf-8-sig'
+
+def read_csv_columns(file):
+    columns = list(pd.read_csv(file, nrows=0, encoding=csv_encoding(file)).columns)
+    file.seek(0)
+    return columns
+
+def read_csv_chunks(file, chunksize=CHUNK_SIZE):
+    # Everything is read as text; normalize_chunk() does the typing
+    return pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunksize,
+                       encoding=csv_encoding(file))
+
+def read_ofx_chunks(file, chunksize=CHUNK_SIZE):
+    # OFX/QFX statements (SGML or XML flavour) yield date/amount/description
+    text = io.TextIOWrapper(file, encoding='utf-8', errors='replace')
+    rows = []
+    start = 0
+    buffer = ''
+    for line in text:
+        buffer += line
+        if '</STMTTRN>' not in line.upper():
+            continue
+        for block in OFX_TRANSACTION.findall(buffer):
+            fields = {tag.upper(): value.strip() for tag, value in OFX_FIELD.findall(block)}
+            rows.append({
+                'date': fields.get('DTPOSTED', '')[:8],
+                'amount': fields.get('TRNAMT', ''),
+                'description': fields.get('NAME') or fields.get('MEMO', ''),
+            })
+        buffer = buffer[buffer.upper().rindex('</STMTTRN>') + len('</STMTTRN>'):]
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows, index=range(start, start + len(rows)))
+            start += len(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, index=range(start, start + len(rows)))
+    text.detach()
+
+
+def _parse_amounts(values):
+    amounts = pd.to_numeric(values, errors='coerce')
+    # Only values like "$1,200.00" or "(45.10)" need the slower cleanup
+    messy = amounts.isna()
+    if messy.any():
+        cleaned = values[messy].str.strip().str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+        amounts[messy] = pd.to_numeric(cleaned.str.replace(r'[,$\s]', '', regex=True), errors='coerce')
+    return amounts
+
+def normalize_chunk(chunk, mapping, categories, dayfirst=False):
+    """Map a raw chunk onto transaction columns.
+
+    ``mapping`` maps import fields to source columns; date and amount are
+    required. Without a type column the sign of the amount decides between
+    Income and Expense. Categories outside ``categories[type]`` fall back
+    to the "Other" category of that type. Returns ``(valid, rejected)``.
+    """
+    out = pd.DataFrame(index=chunk.index)
+    reasons = pd.Series('', index=chunk.index)
+
+    with warnings.catch_warnings():
+        # Chunks whose first value is unreadable fall back to per-row parsing
+        warnings.simplefilter('ignore', UserWarning)
+        dates = pd.to_datetime(chunk[mapping['date']], errors='coerce', dayfirst=dayfirst)
+    reasons[dates.isna()] = 'unreadable date'
+    out['date'] = dates.dt.strftime('%Y-%m-%d')
+
+    amounts = _parse_amounts(chunk[mapping['amount']].astype(str))
+    reasons[amounts.isna() & (reasons == '')] = 'unreadable amount'
+
+    if mapping.get('type'):
+        types = chunk[mapping['type']].str.strip().str.lower().map(TYPE_ALIASES)
+        reasons[types.isna() & (reasons == '')] = 'unknown type'
+    else:
+        types = pd.Series('Income', index=chunk.index).where(amounts >= 0, 'Expense')
+    out['type'] = types
+    out['amount'] = amounts.abs()
+    reasons[(out['amount'] == 0) & (reasons == '')] = 'zero amount'
+
+    out['category'] = types.map(DEFAULT_CATEGORIES)
+    if mapping.get('category'):
+        # Match known categories case-insensitively
+        raw = chunk[mapping['category']].str.strip().str.lower()
+        for type_, names in categories.items():
+            lookup = {name.lower(): name for name in names}
+            matched = raw.map(lookup)
+            out['category'] = out['category'].mask((types == type_) & matched.notna(), matched)
+
+    if mapping.get('description'):
+        out['description'] = chunk[mapping['description']].str.strip()
+    else:
+        out['description'] = ''
+
+    rejected = chunk[reasons != ''].assign(reason=reasons[reasons != ''])
+    return out[reasons == ''], rejected
+
+def _content_hashes(rows, user_id, seen):
+    # Identical rows inside one statement are legitimate (two coffees on the
+    # same day), so the n-th occurrence is part of the hash; ``seen`` carries
+    # the occurrence counts across chunks
+    keys = (f'{user_id}|' + rows['date'] + '|' + rows['type'] + '|'
+            + rows['amount'].map('{:.2f}'.format) + '|' + rows['category'] + '|'
+            + rows['description'])
+    occurrence = keys.groupby(keys).cumcount() + keys.map(seen).fillna(0).astype(int)
+    seen.update((occurrence + 1).groupby(keys).max().to_dict())
+    return [hashlib.sha1(f'{key}|{n}'.encode()).hexdigest()
+            for key, n in zip(keys, occurrence)]
+
+def _index_imported_rows(conn, user_id, after_id):
+    # Set-based equivalent of the insert triggers that imported rows skip.
+    # NOT INDEXED keeps this a rowid range scan, which visits the new rows in
+    # insertion order instead of hopping around via the import_hash index.
+    imported = '''FROM transactions NOT INDEXED
+                  WHERE id > ? AND user_id = ? AND import_hash IS NOT NULL'''
+    conn.execute(f'''INSERT INTO transaction_changes (user_id, transaction_id)
+                     SELECT user_id, id {imported}''', (after_id, user_id))
+    conn.execute(f'''INSERT INTO monthly_rollup (user_id, year_month, type, category, total, count)
+                     SELECT user_id, substr(date, 1, 7), type, category, SUM(amount), COUNT(*)
+                     {imported}
+                     GROUP BY user_id, substr(date, 1, 7), type, category
+                     ON CONFLICT (user_id, year_month, type, category)
+                     DO UPDATE SET total = total + excluded.total, count = count + excluded.count''',
+                 (after_id, user_id))
+    conn.execute(f'''INSERT INTO transactions_fts (rowid, description, category)
+                     SELECT (user_id << {SEARCH_ID_BITS}) + id, description, category {imported}''',
+                 (after_id, user_id))
+
+    # Imported expenses are flagged against the statistics as they stood
+    # before the import, which then absorb the batch (Chan et al.'s
+    # pairwise combination of count, mean and m2)
+    conn.execute(f'''INSERT INTO anomalies (transaction_id, user_id, date, category, amount, mean, variance)
+                     SELECT t.id, t.user_id, t.date, t.category, t.amount, s.mean, s.m2 / (s.count - 1)
+                     FROM transactions t NOT INDEXED
+                     JOIN category_stats s ON s.user_id = t.user_id AND s.category = t.category
+                     WHERE t.id > ? AND t.user_id = ? AND t.import_hash IS NOT NULL
+                       AND t.type = 'Expense' AND {IS_ANOMALY.format(x='t.amount')}''',
+                 (after_id, user_id))
+    conn.execute(f'''INSERT INTO category_stats (user_id, category, count, mean, m2)
+                     SELECT user_id, category, COUNT(*), AVG(amount),
+                            MAX(SUM(amount * amount) - SUM(amount) * SUM(amount) / COUNT(*), 0)
+                     {imported} AND type = 'Expense'
+                     GROUP BY user_id, category
+                     ON CONFLICT (user_id, category) DO UPDATE SET
+                         count = count + excluded.count,
+                         mean = mean + (excluded.mean - mean) * excluded.count / (count + excluded.count),
+                         m2 = m2 + excluded.m2 + (excluded.mean - mean) * (excluded.mean - mean)
+                                                 * count * excluded.count / (count + excluded.count)''',
+                 (after_id, user_id))
+
+@traced('db')
+def import_transactions(user_id, chunks, mapping, categories, dayfirst=False, progress=None):
+    """Import statement chunks for a user in one write transaction.
+
+    ``progress`` is called with the number of rows processed so far.
+    Returns a summary dict with inserted/duplicate counts and the rejected
+    source rows.
+    """
+    inserted = duplicates = processed = 0
+    rejected = []
+    seen = {}
+
+    with transaction() as conn:
+        # ids are AUTOINCREMENT and we hold the write lock, so every row
+        # inserted by this import gets an id above the current maximum
+        after_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+        for chunk in chunks:
+            valid, bad = normalize_chunk(chunk, mapping, categories, dayfirst)
+            if not bad.empty:
+                rejected.append(bad.assign(record=bad.index + 1))
+            if not valid.empty:
+                valid = valid.assign(import_hash=_content_hashes(valid, user_id, seen))
+                valid.insert(0, 'user_id', user_id)
+                cursor = conn.executemany('''INSERT OR IGNORE INTO transactions
+                    (user_id, date, type, amount, category, description, import_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    valid.itertuples(index=False, name=None))
+                inserted += cursor.rowcount
+                duplicates += len(valid) - cursor.rowcount
+            processed += len(chunk)
+            if progress:
+                progress(processed)
+        _index_imported_rows(conn, user_id, after_id)
+
+    get_transaction_cache().invalidate(user_id)
+    return {
+        'processed': processed,
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'rejected': pd.concat(rejected) if rejected else pd.DataFrame(),
+    }
@@ -0,0 +1,138 @@
+"""RAO Bot insights, precomputed in the background.
+
+The answers to the RAO Bot's questions are computed together, in one pass
+over the user's monthly rollup, and cached under the user's transaction
+version. Every write bumps that version and wakes the engine thread, which
+recomputes the insights of the users it has served, so "Get Insights"
+finds them ready.
+
+Budget progress and unusual expenses are not part of it: they are served
+live from budgets.py and anomalies.py with one query each.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+from database import CACHED_USERS, get_transaction_cache
+from profiling import traced
+from reports import get_rollup
+
+logger = get_logger(__name__)
+
+
+@traced('compute')
+def compute_insights(user_id):
+    """Everything the RAO Bot answers from transactions, as a dict.
+
+    Keys: monthly_expenses and comparison (monthly Expense and Income vs
+    Expenses, indexed by 'YYYY-MM'), avg_monthly_expense, above_average
+    (this month's spending vs that average), top_expenses (category totals,
+    largest first) and expense_ratio.
+    """
+    rollup = get_rollup(user_id)
+
+    # Monthly and category totals in one aggregation each
+    monthly = rollup.pivot_table(index='year_month', columns='type', values='total',
+                                 aggfunc='sum').reindex(columns=['Income', 'Expense'])
+    expenses = rollup[rollup['type'] == 'Expense']
+    monthly_expenses = monthly['Expense'].dropna()
+    avg_monthly_expense = monthly_expenses.mean()
+    total_income, total_expense = monthly['Income'].sum(), monthly['Expense'].sum()
+
+    return {
+        'monthly_expenses': monthly_expenses,
+        'avg_monthly_expense': avg_monthly_expense,
+        'above_average': bool(len(monthly_expenses)) and monthly_expenses.iloc[-1] > avg_monthly_expense,
+        'comparison': monthly.rename(columns={'Expense': 'Expenses'}).rename_axis(columns=None),
+        'top_expenses': expenses.groupby('category')['total'].sum().sort_values(ascending=False),
+        'expense_ratio': total_income / total_expense if total_expense else float('inf'),
+    }
+
+
+class InsightEngine(threading.Thread):
+    """Per-user insight cache whose daemon thread recomputes stale entries.
+
+    An entry is keyed by the user's transaction version and the date, so a
+    write or a new day makes it stale. Writes are heard through the
+    transaction cache's listeners; users with a pending refresh are kept in
+    a set, so a burst of writes (an import, say) costs one recomputation.
+    """
+
+    def __init__(self, cache, max_users=CACHED_USERS):
+        super().__init__(name='lucrum-insights', daemon=True)
+        self.cache = cache
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        cache.add_listener(self.invalidate)
+
+    def _key(self, user_id):
+        return self.cache.version(user_id), date.today()
+
+    def _cached(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == self._key(user_id):
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        return None
+
+    def _refresh(self, user_id):
+        # Stored under the key read before computing, so an entry that raced
+        # a write stays stale and the listener schedules another pass
+        key = self._key(user_id)
+        insights = compute_insights(user_id)
+        with self._lock:
+            self._entries[user_id] = (key, insights)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return insights
+
+    def get(self, user_id):
+        insights = self._cached(user_id)
+        return insights if insights is not None else self._refresh(user_id)
+
+    def prefetch(self, user_id):
+        # Compute in the background unless already fresh
+        if self._cached(user_id) is None:
+            with self._lock:
+                self._pending.add(user_id)
+            self._wake.set()
+
+    def invalidate(self, user_id):
+        # Runs on the writing thread, so it only schedules the refresh; users
+        # never served are left alone
+        with self._lock:
+            if user_id not in self._entries:
+                return
+            self._pending.add(user_id)
+        self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            for user_id in pending:
+                try:
+                    self._refresh(user_id)
+                except Exception:
+                    # The next get() computes it on demand instead
+                    logger.exception("Insight refresh failed for user %s", user_id)
+
+@st.cache_resource
+def get_insight_engine():
+    # One engine per process, shared by every session
+    engine = InsightEngine(get_transaction_cache())
+    engine.start()
+    return engine
+
+def get_insights(user_id):
+    return get_insight_engine().get(user_id)
@@ -1,8 +1,36 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import plotly.express as px
+from streamlit.errors import StreamlitInvalidLayoutContextError
+
+from alerts import dismiss_alert, get_alerts, start_alert_scheduler
+from amortization import MAX_MONTHS, STRATEGIES, project_debts, solve_scenarios
+from anomalies import get_anomalies, get_anomaly
+from bills import FREQUENCIES
+from budgets import BUDGET_PERIODS, HISTORY_PERIODS, evaluate_budgets, get_budget_history, period_window
+from database import (
+    create_user, authenticate_user, get_username,
+    get_transaction, get_transaction_page, add_transaction, update_transaction, delete_transaction,
+    set_budget, set_budget_rollover,
+    add_debt, get_debts, update_debt, mark_debt_paid,
+    add_bill_reminder, get_bill_reminders, mark_bill_paid, update_bill_reminder,
+    get_bills_due, get_bill_calendar,
+)
+from forecast import FLOWS, get_forecast
+from importer import (
+    IMPORT_FIELDS, OFX_MAPPING, read_csv_columns, read_csv_chunks, read_ofx_chunks,
+    import_transactions,
+)
+from insights import get_insight_engine
+from profiling import finish_trace, is_admin, show_profiler, span, start_trace, traced
+from reports import (
+    OVERVIEW_PERIODS, get_rollup, get_period_summary,
+    monthly_totals, category_totals,
+)
+from schema import ensure_schema
 
 # Page config
 st.set_page_config(
@@ -60,34 +88,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def init_db():
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    
-    # Drop existing budgets table
-    c.execute('DROP TABLE IF EXISTS budgets')
-    
-    # Create updated budgets table
-    c.execute('''CREATE TABLE IF NOT EXISTS budgets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        category TEXT NOT NULL,
-        amount REAL NOT NULL,
-        period TEXT NOT NULL,
-        start_date TEXT NOT NULL,
-        end_date TEXT NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        UNIQUE(user_id, category, period, start_date)
-    )''')
-    
-    conn.commit()
-    conn.close()
+# Opt-in profiling of this rerun (LUCRUM_PROFILE=1)
+trace = start_trace()
 
-# Call init_db() to update the database structure
-init_db()
-
-# Initialize database
-init_db()
+# Create or upgrade the database schema (once per process)
+ensure_schema()
+# Background scan that keeps the alerts table current for every user
+alert_scheduler = start_alert_scheduler()
 
 # Initialize session state for user
 if 'user_id' not in st.session_state:
@@ -209,20 +216,14 @@ if st.session_state.user_id is None:
                     elif not new_username or not new_password:
                         st.error("Please fill in all fields!")
                     else:
-                        conn = sqlite3.connect('finance.db')
-                        c = conn.cursor()
                         try:
-                            c.execute('INSERT INTO users (username, password) VALUES (?, ?)',
-                                    (new_username, new_password))
-                            conn.commit()
+                            create_user(new_username, new_password)
                             st.markdown('<div class="success">Registration successful! Please login.</div>', 
                                       unsafe_allow_html=True)
                             st.balloons()
                             st.session_state.show_register = False
                         except sqlite3.IntegrityError:
                             st.error("Username already exists!")
-                        finally:
-                            conn.close()
             
             st.markdown('<div class="toggle-link">Don\'t have an account?</div>', unsafe_allow_html=True)
             if st.button("Register here", key="reg_here"):
@@ -239,15 +240,10 @@ if st.session_state.user_id is None:
                     if not username or not password:
                         st.error("Please fill in all fields!")
                     else:
-                        conn = sqlite3.connect('finance.db')
-                        c = conn.cursor()
-                        c.execute('SELECT id FROM users WHERE username = ? AND password = ?',
-                                (username, password))
-                        result = c.fetchone()
-                        conn.close()
+                        user_id = authenticate_user(username, password)
                         
-                        if result:
-                            st.session_state.user_id = result[0]
+                        if user_id:
+                            st.session_state.user_id = user_id
                             st.rerun()
                         else:
                             st.error("Invalid username or password!")
@@ -257,213 +253,26 @@ if st.session_state.user_id is None:
                 st.session_state.show_register = True
                 st.rerun()
 
-# Database functions remain the same as previous version
-
-# Add new function to get username
-def get_username(user_id):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('SELECT username FROM users WHERE id = ?', (user_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-# Add function to delete transaction
-def delete_transaction(transaction_id):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
-    conn.commit()
-    conn.close()
-
-# Add function to update transaction
-def update_transaction(id, date, type_, amount, category):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('''UPDATE transactions 
-                 SET date = ?, type = ?, amount = ?, category = ?
-                 WHERE id = ?''', (date, type_, amount, category, id))
-    conn.commit()
-    conn.close()
-
-def get_transactions(user_id):
-    conn = sqlite3.connect('finance.db')
-    df = pd.read_sql_query('''
-        SELECT id, date, type, amount, category, description 
-        FROM transactions 
-        WHERE user_id = ?
-        ORDER BY date DESC''', 
-        conn, 
-        params=(user_id,))
-    conn.close()
-    return df
-
-def add_transaction(user_id, date, type_, amount, category, description):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO transactions (user_id, date, type, amount, category, description)
-                 VALUES (?, ?, ?, ?, ?, ?)''', 
-              (user_id, date, type_, amount, category, description))
-    conn.commit()
-    conn.close()
-
-def set_budget(user_id, category, amount, period):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    
-    # Calculate start and end dates based on period
-    today = datetime.now()
-    if period == "Weekly":
-        start_date = today - timedelta(days=today.weekday())
-        end_date = start_date + timedelta(days=6)
-    elif period == "Monthly":
-        start_date = today.replace(day=1)
-        next_month = today.replace(day=28) + timedelta(days=4)
-        end_date = next_month.replace(day=1) - timedelta(days=1)
-    else:  # Yearly
-        start_date = today.replace(month=1, day=1)
-        end_date = today.replace(month=12, day=31)
-    
-    c.execute('''INSERT OR REPLACE INTO budgets 
-                 (user_id, category, amount, period, start_date, end_date)
-                 VALUES (?, ?, ?, ?, ?, ?)''', 
-              (user_id, category, amount, period, 
-               start_date.strftime("%Y-%m-%d"), 
-               end_date.strftime("%Y-%m-%d")))
-    conn.commit()
-    conn.close()
-
-def get_budgets(user_id, period=None):
-    conn = sqlite3.connect('finance.db')
-    query = '''
-        SELECT category, amount, period, start_date, end_date
-        FROM budgets
-        WHERE user_id = ?
-    '''
-    params = [user_id]
-    
-    if period:
-        query += ' AND period = ?'
-        params.append(period)
-    
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    return df
-
-# Add debt management functions
-def add_debt(user_id, name, type_, amount, interest_rate, minimum_payment, due_date):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO debts (user_id, name, type, amount, interest_rate, 
-                minimum_payment, due_date, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'Active')''', 
-              (user_id, name, type_, amount, interest_rate, minimum_payment, due_date))
-    conn.commit()
-    conn.close()
-
-def get_debts(user_id):
-    conn = sqlite3.connect('finance.db')
-    df = pd.read_sql_query('''
-        SELECT * FROM debts 
-        WHERE user_id = ? AND status = 'Active'
-        ORDER BY due_date''', 
-        conn, params=(user_id,))
-    conn.close()
-    return df
-
-def update_debt(debt_id, amount):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('UPDATE debts SET amount = ? WHERE id = ?', (amount, debt_id))
-    conn.commit()
-    conn.close()
-
-def mark_debt_paid(debt_id):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    
-    # Get debt details before marking as paid
-    c.execute("SELECT name, amount FROM debts WHERE id = ?", (debt_id,))
-    debt_details = c.fetchone()
-    
-    if debt_details:
-        # Update debt status
-        c.execute("UPDATE debts SET status = 'Paid' WHERE id = ?", (debt_id,))
-        
-        # Add as expense transaction
-        c.execute('''INSERT INTO transactions 
-                    (user_id, date, type, amount, category, description)
-                    VALUES (?, ?, ?, ?, ?, ?)''',
-                 (st.session_state.user_id, 
-                  datetime.now().strftime("%Y-%m-%d"),
-                  "Expense",
-                  debt_details[1],
-                  "Debt Payment",
-                  f"Paid off: {debt_details[0]}")
-        )
-    
-    conn.commit()
-    conn.close()
-
-# Add bill reminder functions
-def add_bill_reminder(user_id, name, amount, due_date, frequency):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO bill_reminders 
-                 (user_id, name, amount, due_date, frequency, status)
-                 VALUES (?, ?, ?, ?, ?, 'Pending')''',
-              (user_id, name, amount, due_date, frequency))
-    conn.commit()
-    conn.close()
-
-def get_bill_reminders(user_id):
-    conn = sqlite3.connect('finance.db')
-    df = pd.read_sql_query('''
-        SELECT * FROM bill_reminders 
-        WHERE user_id = ? AND status = 'Pending'
-        ORDER BY due_date''',
-        conn, params=(user_id,))
-    conn.close()
-    return df
-
-def mark_bill_paid(reminder_id):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    
-    # Get bill details before marking as paid
-    c.execute("SELECT name, amount FROM bill_reminders WHERE id = ?", (reminder_id,))
-    bill_details = c.fetchone()
-    
-    if bill_details:
-        # Update bill status
-        c.execute("UPDATE bill_reminders SET status = 'Paid' WHERE id = ?", (reminder_id,))
-        
-        # Add as expense transaction
-        c.execute('''INSERT INTO transactions 
-                    (user_id, date, type, amount, category, description)
-                    VALUES (?, ?, ?, ?, ?, ?)''',
-                 (st.session_state.user_id, 
-                  datetime.now().strftime("%Y-%m-%d"),
-                  "Expense",
-                  bill_details[1],
-                  "Bills",
-                  f"Paid: {bill_details[0]}")
-        )
-    
-    conn.commit()
-    conn.close()
-
-def update_bill_reminder(reminder_id, name, amount, due_date, frequency):
-    conn = sqlite3.connect('finance.db')
-    c = conn.cursor()
-    c.execute('''UPDATE bill_reminders 
-                 SET name = ?, amount = ?, due_date = ?, frequency = ?
-                 WHERE id = ?''', 
-              (name, amount, due_date, frequency, reminder_id))
-    conn.commit()
-    conn.close()
+def rerun_fragment():
+    # Row actions arrive as fragment reruns, so redraw just that fragment; a
+    # click that was handled by a full run falls back to a full rerun
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitInvalidLayoutContextError:
+        st.rerun()
 
+@st.fragment
+@traced('ui')
 def display_transaction(transaction):
+    # Edit and Delete rerun only this row; a changed row is re-read from the
+    # database since the fragment is called again with its original data
+    updates = st.session_state.setdefault('transaction_updates', {})
+    if transaction['id'] in updates:
+        transaction = updates[transaction['id']]
+        if transaction is None:
+            st.caption("Transaction deleted.")
+            return
+
     with st.container():
         col1, col2, col3, col4 = st.columns([2, 3, 2, 1])
         
@@ -490,8 +299,8 @@ def display_transaction(transaction):
                 st.session_state.editing = transaction['id']
             if st.button("Delete", key=f"delete_{transaction['id']}"):
                 delete_transaction(transaction['id'])
-                st.success("Transaction deleted!")
-                st.rerun()
+                updates[transaction['id']] = None
+                rerun_fragment()
         
         # Edit form
         if hasattr(st.session_state, 'editing') and st.session_state.editing == transaction['id']:
@@ -532,8 +341,8 @@ def display_transaction(transaction):
                         edit_category
                     )
                     del st.session_state.editing
-                    st.success("Transaction updated!")
-                    st.rerun()
+                    updates[transaction['id']] = get_transaction(transaction['id'])
+                    rerun_fragment()
         
         st.divider()
 
@@ -579,6 +388,30 @@ def create_budget_progress(category, spent, budget):
         </div>
     """, unsafe_allow_html=True)
 
+def show_alerts(alerts_df, dismissible=False):
+    for _, alert in alerts_df.iterrows():
+        show = st.error if alert['level'] == 'error' else st.warning
+        show(f"⚠️ {alert['message']}")
+        if dismissible and st.button("Dismiss", key=f"dismiss_alert_{alert['id']}"):
+            dismiss_alert(alert['id'])
+            st.rerun()
+
+def budget_labels(budget_status):
+    # Category names, qualified by period when several periods are listed
+    if budget_status['period'].nunique() > 1:
+        return budget_status['category'] + " (" + budget_status['period'] + ")"
+    return budget_status['category']
+
+def show_budget_status(budget_status, on_track=False):
+    # One line per budget over its warning threshold (and the rest if on_track)
+    for label, budget in zip(budget_labels(budget_status), budget_status.itertuples()):
+        if budget.level == 'error':
+            st.error(f"⚠️ {label}: You've used {budget.used:.1f}% of your budget!")
+        elif budget.level == 'warning':
+            st.warning(f"⚠️ {label}: You've used {budget.used:.1f}% of your budget")
+        elif on_track:
+            st.success(f"✅ {label}: You've used {budget.used:.1f}% of your budget")
+
 # Main interface (login part remains the same)
 if st.session_state.user_id is None:
     # ... (keep existing login code)
@@ -591,8 +424,10 @@ else:
     st.title(f"Welcome {username}! 👋")
     
     # Sidebar for adding transactions
-    with st.sidebar:
+    with st.sidebar, span('Sidebar', 'tab'):
         st.header("Add Transaction")
+        if 'unusual_expense' in st.session_state:
+            st.warning(st.session_state.pop('unusual_expense'))
         date = st.date_input("Date", datetime.now())
         transaction_type = st.selectbox("Type", ["Income", "Expense"])
         description = st.text_input("Description", placeholder="Enter transaction description")
@@ -612,636 +447,866 @@ else:
         if st.button("Add Transaction", type="primary"):
             if amount > 0:
                 with st.spinner('Adding transaction...'):
-                    add_transaction(
+                    # Writes go through the shared write queue; wait for the
+                    # group commit so the rerun below already shows the row
+                    transaction_id = add_transaction(
                         st.session_state.user_id,
                         date.strftime("%Y-%m-%d"),
                         transaction_type,
                         amount,
                         category,
                         description
-                    )
+                    ).result()
+                # The insert trigger has already checked it against the category's history
+                anomaly = get_anomaly(transaction_id)
+                if anomaly is not None:
+                    # Shown after the rerun below
+                    st.session_state.unusual_expense = (
+                        f"⚠️ ${anomaly['amount']:,.2f} is unusually large for {anomaly['category']} "
+                        f"(you usually spend ${anomaly['mean']:,.2f})")
                 st.success("Transaction added!")
                 st.balloons()  # Celebration effect!
                 st.rerun()
             else:
                 st.error("Please enter an amount greater than 0")
         
+        # Pending bill, debt and budget alerts
+        alerts_df = get_alerts(st.session_state.user_id)
+        if not alerts_df.empty:
+            st.divider()
+            st.header(f"🔔 Alerts ({len(alerts_df)})")
+            show_alerts(alerts_df, dismissible=True)
+
         if st.button("Logout", type="secondary"):
             st.session_state.user_id = None
             st.rerun()
 
-    # Main content area with tabs
+    # Main content area with tabs. Switching tabs reruns the script and only
+    # the open tab's body runs, so each section fetches just its own data
     tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "📊 Overview", "📝 Transactions", "📈 Analysis", 
-        "💰 Budget", "🤖 RAO Bot", "💳 Debt Tracker", "📅 Bills"])
-
-    # Get all transactions
-    df = get_transactions(st.session_state.user_id)
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
+        "💰 Budget", "🤖 RAO Bot", "💳 Debt Tracker", "📅 Bills"],
+        key="section", on_change="rerun")
 
-    with tab1:
-        with st.spinner('Loading your financial summary...'):
-            # Get transactions
-            if not df.empty:
-                # Get budgets data
-                budgets_df = get_budgets(st.session_state.user_id)
+    if tab1.open:
+        with tab1, span('Overview tab', 'tab'):
+            # Monthly per-category totals that the dashboards are drawn from
+            rollup = get_rollup(st.session_state.user_id)
+            with st.spinner('Loading your financial summary...'):
+                # Only render once the user has some transactions
+                if not rollup.empty:
+                    # Spent vs limit for every active budget, evaluated once
+                    budget_status = evaluate_budgets(st.session_state.user_id)
                 
-                total_income = df[df['type'] == 'Income']['amount'].sum()
-                total_expense = df[df['type'] == 'Expense']['amount'].sum()
-                balance = total_income - total_expense
+                    # Metric cards sit above the period selector but are filled in below
+                    cards = st.container()
 
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    create_metric_card("Total Income", total_income, None, "💵")
-                with col2:
-                    create_metric_card("Total Expenses", total_expense, None, "💸")
-                with col3:
-                    create_metric_card("Current Balance", balance, None, "🏦")
+                    # Time period selector for overview
+                    period = st.selectbox("Select Time Period", OVERVIEW_PERIODS)
 
-                # Time period selector for overview
-                period = st.selectbox(
-                    "Select Time Period",
-                    ["Last 7 days", "Last 30 days", "This Month", "This Year", "All Time"]
-                )
+                    # Per-category sums for the period and all-time totals, aggregated by SQLite
+                    by_category, total_income, total_expense = get_period_summary(
+                        st.session_state.user_id, period)
+                    balance = total_income - total_expense
 
-                # Filter data based on selected period
-                today = datetime.now()
-                if period == "Last 7 days":
-                    df_period = df[df['date'] >= today - timedelta(days=7)]
-                elif period == "Last 30 days":
-                    df_period = df[df['date'] >= today - timedelta(days=30)]
-                elif period == "This Month":
-                    df_period = df[df['date'].dt.month == today.month]
-                elif period == "This Year":
-                    df_period = df[df['date'].dt.year == today.year]
-                else:
-                    df_period = df
+                    with cards:
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            create_metric_card("Total Income", total_income, None, "💵")
+                        with col2:
+                            create_metric_card("Total Expenses", total_expense, None, "💸")
+                        with col3:
+                            create_metric_card("Current Balance", balance, None, "🏦")
 
-                # Show charts for the selected period
-                col1, col2 = st.columns(2)
-                with col1:
-                    # Expense breakdown
-                    expenses = df_period[df_period['type'] == 'Expense']
-                    if not expenses.empty:
-                        fig = px.pie(expenses, values='amount', names='category',
-                                   title=f"Expense Distribution - {period}")
-                        st.plotly_chart(fig, use_container_width=True)
+                    # Show charts for the selected period
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        # Expense breakdown
+                        expenses = by_category[by_category['type'] == 'Expense']
+                        if not expenses.empty:
+                            fig = px.pie(expenses, values='total', names='category',
+                                       title=f"Expense Distribution - {period}")
+                            st.plotly_chart(fig, use_container_width=True)
 
-                with col2:
-                    # Income breakdown
-                    income = df_period[df_period['type'] == 'Income']
-                    if not income.empty:
-                        fig = px.pie(income, values='amount', names='category',
-                                   title=f"Income Distribution - {period}")
-                        st.plotly_chart(fig, use_container_width=True)
+                    with col2:
+                        # Income breakdown
+                        income = by_category[by_category['type'] == 'Income']
+                        if not income.empty:
+                            fig = px.pie(income, values='total', names='category',
+                                       title=f"Income Distribution - {period}")
+                            st.plotly_chart(fig, use_container_width=True)
 
-                # Show budget progress
-                if not df.empty:
-                    st.subheader("Budget Progress")
+                    # Show budget progress
+                    if not rollup.empty:
+                        st.subheader("Budget Progress")
                     
-                    if not budgets_df.empty:
-                        # Calculate current month's expenses by category
-                        current_month_expenses = df[
-                            (df['type'] == 'Expense') & 
-                            (df['date'].dt.month == datetime.now().month)
-                        ].groupby('category')['amount'].sum()
-                        
-                        # Show progress bars for each category
-                        for _, budget_row in budgets_df.iterrows():
-                            category = budget_row['category']
-                            budget_amount = budget_row['amount']
-                            spent = current_month_expenses.get(category, 0)
-                            create_budget_progress(category, spent, budget_amount)
+                        if not budget_status.empty:
+                            # Show progress bars for each budget in its own window
+                            for label, budget in zip(budget_labels(budget_status), budget_status.itertuples()):
+                                create_budget_progress(label, budget.spent, budget.available)
 
-                        # Add budget alerts
-                        st.subheader("Budget Alerts")
-                        for _, budget_row in budgets_df.iterrows():
-                            category = budget_row['category']
-                            budget_amount = budget_row['amount']
-                            spent = current_month_expenses.get(category, 0)
-                            progress = (spent / budget_amount) * 100 if budget_amount > 0 else 0
-                            
-                            if progress >= 90:
-                                st.error(f"⚠️ {category}: You've used {progress:.1f}% of your budget!")
-                            elif progress >= 75:
-                                st.warning(f"⚠️ {category}: You've used {progress:.1f}% of your budget")
+                            st.subheader("Budget Alerts")
+                            show_budget_status(budget_status)
 
-    with tab2:
-        with st.spinner('Loading your transactions...'):
-            # Transaction management
-            st.header("Manage Transactions")
+    if tab2.open:
+        with tab2, span('Transactions tab', 'tab'):
+            with st.spinner('Loading your transactions...'):
+                # Transaction management
+                st.header("Manage Transactions")
             
-            # Search and filter options
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                search_term = st.text_input("Search by category")
-            with col2:
-                type_filter = st.multiselect("Filter by type", ["Income", "Expense"])
-            with col3:
-                date_range = st.date_input("Date range", 
-                                         value=(datetime.now() - timedelta(days=30), datetime.now()),
-                                         key="date_range")
+                # Bulk import of bank statements
+                with st.expander("Import Statement"):
+                    statement = st.file_uploader("CSV or OFX/QFX file", type=["csv", "ofx", "qfx"],
+                                                 key="statement_file")
+                    if statement is not None:
+                        is_ofx = statement.name.lower().endswith((".ofx", ".qfx"))
+                        mapping = OFX_MAPPING if is_ofx else None
+                        if not is_ofx:
+                            try:
+                                columns = read_csv_columns(statement)
+                            except (ValueError, UnicodeDecodeError) as exc:
+                                # An empty or malformed file; EmptyDataError and ParserError are ValueErrors
+                                st.error(f"Could not read the statement: {exc}")
+                            else:
+                                # Let the user match the file's columns to transaction fields
+                                options = ["(none)"] + columns
+                                mapping = {}
+                                for col, field in zip(st.columns(len(IMPORT_FIELDS)), IMPORT_FIELDS):
+                                    guess = next((c for c in columns if c.strip().lower() == field), "(none)")
+                                    with col:
+                                        choice = st.selectbox(field.title(), options, index=options.index(guess),
+                                                              key=f"import_map_{field}")
+                                    mapping[field] = None if choice == "(none)" else choice
 
-            if not df.empty:
-                # Apply filters
-                filtered_df = df.copy()
-                if search_term:
-                    filtered_df = filtered_df[filtered_df['category'].str.contains(search_term, case=False)]
-                if type_filter:
-                    filtered_df = filtered_df[filtered_df['type'].isin(type_filter)]
+                        if mapping is not None:
+                            dayfirst = st.checkbox("Dates are day-first (DD/MM/YYYY)", key="import_dayfirst")
+                        if mapping is not None and st.button("Import", key="import_statement"):
+                            if not mapping.get("date") or not mapping.get("amount"):
+                                st.error("Please map at least the date and amount columns")
+                            else:
+                                statement.seek(0)
+                                bar = st.progress(0.0, text="Importing...")
+                                try:
+                                    chunks = read_ofx_chunks(statement) if is_ofx else read_csv_chunks(statement)
+                                    st.session_state.import_summary = import_transactions(
+                                        st.session_state.user_id,
+                                        chunks,
+                                        mapping,
+                                        {"Income": income_categories, "Expense": expense_categories},
+                                        dayfirst,
+                                        progress=lambda rows: bar.progress(
+                                            min(statement.tell() / max(statement.size, 1), 1.0),
+                                            text=f"Processed {rows:,} rows")
+                                    )
+                                except (ValueError, UnicodeDecodeError) as exc:
+                                    # The import runs in one transaction, so nothing was stored
+                                    bar.empty()
+                                    st.session_state.pop('import_summary', None)
+                                    st.error(f"Could not read the statement, nothing was imported: {exc}")
+                                else:
+                                    st.rerun()
+
+                    # Summary of the last import
+                    if 'import_summary' in st.session_state:
+                        summary = st.session_state.import_summary
+                        st.success(f"Imported {summary['inserted']:,} of {summary['processed']:,} rows "
+                                   f"({summary['duplicates']:,} duplicates skipped, "
+                                   f"{len(summary['rejected']):,} rejected)")
+                        if not summary['rejected'].empty:
+                            st.warning("These rows could not be imported:")
+                            st.dataframe(summary['rejected'], hide_index=True, use_container_width=True)
+            
+                # Search and filter options
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    search_term = st.text_input("Search description or category")
+                with col2:
+                    type_filter = st.multiselect("Filter by type", ["Income", "Expense"])
+                with col3:
+                    date_range = st.date_input("Date range", 
+                                             value=(datetime.now() - timedelta(days=30), datetime.now()),
+                                             key="date_range")
+
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    view_mode = st.radio("View", ["Compact", "Detailed"], horizontal=True, key="txn_view")
+                with col2:
+                    page_size = st.selectbox("Rows per page", [25, 50, 100, 250], key="txn_page_size")
+
+                # Start again from the first page whenever the filters change
+                filters = (search_term, tuple(type_filter), tuple(date_range), page_size)
+                if st.session_state.get('txn_filters') != filters:
+                    st.session_state.txn_filters = filters
+                    st.session_state.txn_cursors = [None]
+                cursors = st.session_state.txn_cursors
+
+                start_date, end_date = None, None
                 if len(date_range) == 2:
-                    filtered_df = filtered_df[
-                        (filtered_df['date'].dt.date >= date_range[0]) & 
-                        (filtered_df['date'].dt.date <= date_range[1])
-                    ]
+                    start_date, end_date = (d.strftime("%Y-%m-%d") for d in date_range)
 
-                # Display transactions using the new function
-                for _, transaction in filtered_df.iterrows():
-                    display_transaction(transaction)
+                page, next_cursor = get_transaction_page(
+                    st.session_state.user_id,
+                    page_size,
+                    cursors[-1],
+                    types=type_filter,
+                    start_date=start_date,
+                    end_date=end_date,
+                    search=search_term
+                )
+
+                # Rows were just read fresh, so earlier in-place edits are stale
+                st.session_state.transaction_updates = {}
+                if page.empty:
+                    st.info("No transactions match these filters.")
+                elif view_mode == "Compact":
+                    grid = st.dataframe(
+                        page[['date', 'type', 'category', 'amount', 'description']],
+                        hide_index=True,
+                        use_container_width=True,
+                        on_select="rerun",
+                        selection_mode="single-row",
+                        # Selection state follows the key, so key it on the rows shown: a
+                        # new page, filter or deletion starts with nothing selected
+                        key=f"txn_grid_{hash(tuple(page['id']))}",
+                        column_config={
+                            "date": st.column_config.DateColumn("Date"),
+                            "amount": st.column_config.NumberColumn("Amount", format="$%.2f"),
+                        }
+                    )
+                    # Edit controls are only built for the row picked in the grid
+                    selected = grid.selection.rows
+                    if selected and selected[0] < len(page):
+                        display_transaction(page.iloc[selected[0]])
+                else:
+                    for _, transaction in page.iterrows():
+                        display_transaction(transaction)
+
+                # Keyset page navigation
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col1:
+                    if st.button("← Newer", key="txn_newer", disabled=len(cursors) == 1):
+                        cursors.pop()
+                        st.rerun()
+                with col2:
+                    st.caption(f"Page {len(cursors)}")
+                with col3:
+                    if st.button("Older →", key="txn_older", disabled=next_cursor is None):
+                        cursors.append(next_cursor)
+                        st.rerun()
 
-    with tab3:
-        with st.spinner('Analyzing your financial data...'):
-            st.header("Financial Analysis")
+    if tab3.open:
+        with tab3, span('Analysis tab', 'tab'):
+            rollup = get_rollup(st.session_state.user_id)
+            with st.spinner('Analyzing your financial data...'):
+                st.header("Financial Analysis")
             
-            if not df.empty:
-                # Spending trends over time
-                monthly_expenses = df[df['type'] == 'Expense'].set_index('date').resample('M')['amount'].sum()
-                monthly_income = df[df['type'] == 'Income'].set_index('date').resample('M')['amount'].sum()
+                if not rollup.empty:
+                    # Spending trends over time
+                    monthly_expenses = monthly_totals(rollup, 'Expense')
+                    monthly_income = monthly_totals(rollup, 'Income')
                 
-                fig = px.line(title="Monthly Trends")
-                fig.add_scatter(x=monthly_expenses.index, y=monthly_expenses.values, name="Expenses")
-                fig.add_scatter(x=monthly_income.index, y=monthly_income.values, name="Income")
-                st.plotly_chart(fig, use_container_width=True)
+                    fig = px.line(title="Monthly Trends")
+                    fig.add_scatter(x=pd.to_datetime(monthly_expenses.index), y=monthly_expenses.values, name="Expenses")
+                    fig.add_scatter(x=pd.to_datetime(monthly_income.index), y=monthly_income.values, name="Income")
+                    st.plotly_chart(fig, use_container_width=True)
 
-                # Category analysis
-                st.subheader("Top Spending Categories")
-                top_expenses = df[df['type'] == 'Expense'].groupby('category')['amount'].sum().sort_values(ascending=False)
-                fig = px.bar(
-                    data_frame=pd.DataFrame({'Category': top_expenses.index, 'Amount': top_expenses.values}),
-                    x='Category',
-                    y='Amount',
-                    title="Top Spending Categories"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                    # Category analysis
+                    st.subheader("Top Spending Categories")
+                    top_expenses = category_totals(rollup, 'Expense')
+                    fig = px.bar(
+                        data_frame=pd.DataFrame({'Category': top_expenses.index, 'Amount': top_expenses.values}),
+                        x='Category',
+                        y='Amount',
+                        title="Top Spending Categories"
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
 
-                # Basic statistics
-                st.subheader("Statistics")
-                col1, col2 = st.columns(2)
+                    # Basic statistics
+                    st.subheader("Statistics")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write("Average monthly expense:", f"${monthly_expenses.mean():,.2f}")
+                    with col2:
+                        st.write("Average monthly income:", f"${monthly_income.mean():,.2f}")
+                else:
+                    st.info("Add some transactions to see your financial analysis!")
+
+                # Daily balance for the next 12 months, from recurring
+                # transactions, scheduled bills and debt minimums
+                st.subheader("Cash-flow Forecast")
+                forecast = get_forecast(st.session_state.user_id)
+                lowest = forecast['balance'].idxmin()
+                col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.write("Average monthly expense:", f"${df[df['type'] == 'Expense'].groupby(df['date'].dt.month)['amount'].sum().mean():,.2f}")
+                    st.metric("Balance today", f"${forecast['balance'].iloc[0]:,.2f}")
                 with col2:
-                    st.write("Average monthly income:", f"${df[df['type'] == 'Income'].groupby(df['date'].dt.month)['amount'].sum().mean():,.2f}")
-            else:
-                st.info("Add some transactions to see your financial analysis!")
+                    st.metric("In 12 months", f"${forecast['balance'].iloc[-1]:,.2f}")
+                with col3:
+                    st.metric(f"Lowest ({lowest.strftime('%Y-%m-%d')})", f"${forecast['balance'].min():,.2f}")
+                if forecast['balance'].min() < 0:
+                    st.warning(f"⚠️ Your balance is projected to go negative on "
+                               f"{forecast.index[forecast['balance'] < 0][0].strftime('%Y-%m-%d')}")
 
-    with tab4:
-        with st.spinner('Loading budget information...'):
-            st.header("Budget Management")
-            
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                budget_period = st.selectbox(
-                    "Budget Period",
-                    ["Monthly", "Weekly", "Yearly"],
-                    key="budget_period"
-                )
-            with col2:
-                if st.button("Confirm Period", type="primary"):
-                    st.session_state.confirmed_period = budget_period
-                    st.rerun()
+                fig = px.line(forecast, y='balance', title="Projected Balance",
+                              labels={'date': 'Date', 'balance': 'Balance'})
+                st.plotly_chart(fig, use_container_width=True)
+
+                monthly_forecast = forecast[FLOWS].resample('MS').sum()
+                monthly_forecast.index = monthly_forecast.index.strftime('%Y-%m')
+                st.dataframe(monthly_forecast.round(2), use_container_width=True)
+
+    if tab4.open:
+        with tab4, span('Budget tab', 'tab'):
+            with st.spinner('Loading budget information...'):
+                st.header("Budget Management")
             
-            if 'confirmed_period' not in st.session_state:
-                st.session_state.confirmed_period = "Monthly"  # Default period
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    budget_period = st.selectbox(
+                        "Budget Period",
+                        BUDGET_PERIODS,
+                        key="budget_period"
+                    )
+                with col2:
+                    if st.button("Confirm Period", type="primary"):
+                        st.session_state.confirmed_period = budget_period
+                        st.rerun()
             
-            # Get existing budgets for the selected period
-            budgets_df = get_budgets(st.session_state.user_id, st.session_state.confirmed_period)
+                if 'confirmed_period' not in st.session_state:
+                    st.session_state.confirmed_period = "Monthly"  # Default period
             
-            # Show current period info
-            if st.session_state.confirmed_period == "Weekly":
-                start_date = datetime.now() - timedelta(days=datetime.now().weekday())
-                end_date = start_date + timedelta(days=6)
-            elif st.session_state.confirmed_period == "Monthly":
-                start_date = datetime.now().replace(day=1)
-                next_month = datetime.now().replace(day=28) + timedelta(days=4)
-                end_date = next_month.replace(day=1) - timedelta(days=1)
-            else:  # Yearly
-                start_date = datetime.now().replace(month=1, day=1)
-                end_date = datetime.now().replace(month=12, day=31)
+                # Progress and limits; Confirm reruns only this part of the tab
+                @st.fragment
+                def budget_overview():
+                    # Active budgets for the selected period, evaluated in its current window
+                    budget_status = evaluate_budgets(st.session_state.user_id)
+                    budget_status = budget_status[budget_status['period'] == st.session_state.confirmed_period]
             
-            st.info(f"Showing budgets for: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+                    # Show current period info
+                    start_date, end_date = period_window(st.session_state.confirmed_period)
+                    st.info(f"Showing budgets for: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
             
-            # Show budget progress
-            if not df.empty:
-                st.subheader("Budget Progress")
-                
-                if not budgets_df.empty:
-                    # Calculate current month's expenses by category
-                    current_month_expenses = df[
-                        (df['type'] == 'Expense') & 
-                        (df['date'].dt.month == datetime.now().month)
-                    ].groupby('category')['amount'].sum()
-                    
-                    # Show progress bars for each category
-                    for _, budget_row in budgets_df.iterrows():
-                        category = budget_row['category']
-                        budget_amount = budget_row['amount']
-                        spent = current_month_expenses.get(category, 0)
-                        create_budget_progress(category, spent, budget_amount)
+                    # Show budget progress
+                    if not budget_status.empty:
+                        # Rollover applies to every budget of the period, so
+                        # it is only offered once the period has one
+                        rollover = bool(budget_status['rollover'].any())
+                        if st.toggle("Roll over unspent budget into the next period", value=rollover,
+                                     key=f"rollover_{st.session_state.confirmed_period}") != rollover:
+                            set_budget_rollover(st.session_state.user_id, st.session_state.confirmed_period,
+                                                not rollover).result()
+                            alert_scheduler.wake()
+                            rerun_fragment()
 
-                    # Add budget alerts
-                    st.subheader("Budget Alerts")
-                    for _, budget_row in budgets_df.iterrows():
-                        category = budget_row['category']
-                        budget_amount = budget_row['amount']
-                        spent = current_month_expenses.get(category, 0)
-                        progress = (spent / budget_amount) * 100 if budget_amount > 0 else 0
-                        
-                        if progress >= 90:
-                            st.error(f"⚠️ {category}: You've used {progress:.1f}% of your budget!")
-                        elif progress >= 75:
-                            st.warning(f"⚠️ {category}: You've used {progress:.1f}% of your budget")
+                        st.subheader("Budget Progress")
+                        for label, budget in zip(budget_labels(budget_status), budget_status.itertuples()):
+                            create_budget_progress(label, budget.spent, budget.available)
+                            if budget.carried_in > 0:
+                                st.caption(f"Includes ${budget.carried_in:,.2f} rolled over from last period")
+
+                        st.subheader("Budget Alerts")
+                        show_budget_status(budget_status)
                 
-            # Create budget settings for each expense category
-            st.subheader("Set Budget Limits by Category")
+                    # Create budget settings for each expense category
+                    st.subheader("Set Budget Limits by Category")
             
-            # Initialize session state for budget values if not exists
-            if 'budget_values' not in st.session_state:
-                st.session_state.budget_values = {}
+                    # Initialize session state for budget values if not exists
+                    if 'budget_values' not in st.session_state:
+                        st.session_state.budget_values = {}
             
-            for category in expense_categories:
-                current_budget = budgets_df[budgets_df['category'] == category]['amount'].iloc[0] if not budgets_df.empty and (budgets_df['category'] == category).any() else 0.0
+                    for category in expense_categories:
+                        current_budget = budget_status[budget_status['category'] == category]['amount'].iloc[0] if (budget_status['category'] == category).any() else 0.0
                 
-                # Initialize session state for this category if not exists
-                if category not in st.session_state.budget_values:
-                    st.session_state.budget_values[category] = current_budget
+                        # Initialize session state for this category if not exists
+                        if category not in st.session_state.budget_values:
+                            st.session_state.budget_values[category] = current_budget
                 
-                col1, col2, col3 = st.columns([3, 2, 1])
+                        col1, col2, col3 = st.columns([3, 2, 1])
                 
-                with col1:
-                    st.write(category)
-                with col2:
-                    new_budget = st.number_input(
-                        f"Budget for {category}",
-                        min_value=0.0,
-                        value=float(st.session_state.budget_values[category]),
-                        step=10.0,
-                        key=f"budget_input_{category}",
-                        label_visibility="collapsed"
-                    )
-                with col3:
-                    # Only show confirm button if value has changed
-                    if new_budget != current_budget:
-                        if st.button("Confirm", key=f"confirm_{category}"):
-                            set_budget(st.session_state.user_id, category, new_budget, budget_period)
-                            st.session_state.budget_values[category] = new_budget
-                            st.success(f"Budget updated for {category}")
-                            st.rerun()
+                        with col1:
+                            st.write(category)
+                        with col2:
+                            new_budget = st.number_input(
+                                f"Budget for {category}",
+                                min_value=0.0,
+                                value=float(st.session_state.budget_values[category]),
+                                step=10.0,
+                                key=f"budget_input_{category}",
+                                label_visibility="collapsed"
+                            )
+                        with col3:
+                            # Only show confirm button if value has changed
+                            if new_budget != current_budget:
+                                if st.button("Confirm", key=f"confirm_{category}"):
+                                    set_budget(st.session_state.user_id, category, new_budget, budget_period).result()
+                                    alert_scheduler.wake()
+                                    st.session_state.budget_values[category] = new_budget
+                                    st.success(f"Budget updated for {category}")
+                                    rerun_fragment()
+                            else:
+                                st.write("") # Empty space for alignment
+
+                    # Adherence over past periods, read from their frozen results
+                    st.subheader("Budget History")
+                    periods = st.slider("Periods", 2, 24, HISTORY_PERIODS, key="budget_history_periods")
+                    history = get_budget_history(st.session_state.user_id,
+                                                 st.session_state.confirmed_period, periods)
+                    if not history.empty:
+                        fig = px.line(history, x='window_start', y='used', color='category', markers=True,
+                                      labels={'window_start': 'Period', 'used': '% of budget used'},
+                                      title='Budget Used per Period')
+                        fig.add_hline(y=100, line_dash='dash', line_color='red')
+                        st.plotly_chart(fig, use_container_width=True)
+
+                        adherence = history.groupby('category').agg(
+                            periods=('within', 'size'), within_budget=('within', 'sum'),
+                            average_used=('used', 'mean'), total_spent=('spent', 'sum'))
+                        adherence['adherence'] = adherence['within_budget'] * 100 / adherence['periods']
+                        st.dataframe(adherence.round(1), use_container_width=True)
                     else:
-                        st.write("") # Empty space for alignment
+                        st.info("History appears here once a budget period has closed.")
 
-    with tab5:
-        st.header("Financial AI Assistant")
+                budget_overview()
+
+    if tab5.open:
+        with tab5, span('RAO Bot tab', 'tab'):
+            # Answers are precomputed in the background after each write;
+            # start now in case this user's are not ready yet
+            insight_engine = get_insight_engine()
+            insight_engine.prefetch(st.session_state.user_id)
+            rollup = get_rollup(st.session_state.user_id)
+            st.header("Financial AI Assistant")
         
-        if not df.empty:
-            # Common financial questions
-            question = st.selectbox(
-                "What would you like to know?",
-                [
-                    "How are my spending habits?",
-                    "Where can I potentially save money?",
-                    "Am I on track with my budgets?",
-                    "What are my highest expenses?",
-                    "How is my income-expense ratio?",
-                ]
-            )
+            if not rollup.empty:
+                # Common financial questions
+                question = st.selectbox(
+                    "What would you like to know?",
+                    [
+                        "How are my spending habits?",
+                        "Where can I potentially save money?",
+                        "Am I on track with my budgets?",
+                        "What are my highest expenses?",
+                        "How is my income-expense ratio?",
+                    ]
+                )
             
             
-            if st.button("Get Insights"):
-                with st.spinner("Analyzing your financial data..."):
-                    # Calculate key metrics
-                    monthly_expenses = df[df['type'] == 'Expense'].groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum()
-                    avg_monthly_expense = monthly_expenses.mean()
-                    top_expenses = df[df['type'] == 'Expense'].groupby('category')['amount'].sum().sort_values(ascending=False)
-                    income_expense_ratio = df[df['type'] == 'Income']['amount'].sum() / df[df['type'] == 'Expense']['amount'].sum()
+                if st.button("Get Insights"):
+                    with st.spinner("Analyzing your financial data..."):
+                        # Every transaction-based answer, cached until this user's next write
+                        insights = insight_engine.get(st.session_state.user_id)
+                        monthly_expenses = insights['monthly_expenses']
+                        avg_monthly_expense = insights['avg_monthly_expense']
+                        top_expenses = insights['top_expenses']
+                        expense_ratio = insights['expense_ratio']
                     
-                    # Get budget information
-                    budgets_df = get_budgets(st.session_state.user_id)
-                    current_month_expenses = df[
-                        (df['type'] == 'Expense') & 
-                        (df['date'].dt.month == datetime.now().month)
-                    ].groupby('category')['amount'].sum()
+                        st.write("🤖 Here's my analysis:")
                     
-                    st.write("🤖 Here's my analysis:")
-                    
-                    if question == "How are my spending habits?":
-                        st.write(f"📊 Your average monthly spending is ${avg_monthly_expense:,.2f}")
-                        if monthly_expenses.iloc[-1] > avg_monthly_expense:
-                            st.warning("⚠️ Your spending this month is above your monthly average.")
-                        else:
-                            st.success("✅ Your spending this month is below your monthly average.")
+                        if question == "How are my spending habits?":
+                            st.write(f"📊 Your average monthly spending is ${avg_monthly_expense:,.2f}")
+                            if insights['above_average']:
+                                st.warning("⚠️ Your spending this month is above your monthly average.")
+                            else:
+                                st.success("✅ Your spending this month is below your monthly average.")
                         
-                        # Show spending trend
-                        fig = px.line(title="Monthly Spending Trend")
-                        fig.add_scatter(x=monthly_expenses.index, y=monthly_expenses.values)
-                        st.plotly_chart(fig, use_container_width=True)
+                            # Show spending trend
+                            fig = px.line(title="Monthly Spending Trend")
+                            fig.add_scatter(x=monthly_expenses.index, y=monthly_expenses.values)
+                            st.plotly_chart(fig, use_container_width=True)
                     
-                    elif question == "Where can I potentially save money?":
-                        st.write("💡 Here are some observations:")
+                        elif question == "Where can I potentially save money?":
+                            st.write("💡 Here are some observations:")
                         
-                        # Identify categories with highest spending
-                        top_3_expenses = top_expenses.head(3)
-                        st.write("Your top 3 expense categories are:")
-                        for category, amount in top_3_expenses.items():
-                            st.write(f"- {category}: ${amount:,.2f}")
+                            # Identify categories with highest spending
+                            top_3_expenses = top_expenses.head(3)
+                            st.write("Your top 3 expense categories are:")
+                            for category, amount in top_3_expenses.items():
+                                st.write(f"- {category}: ${amount:,.2f}")
                         
-                        # Look for unusual spikes in spending
-                        recent_expenses = df[
-                            (df['type'] == 'Expense') & 
-                            (df['date'] >= datetime.now() - timedelta(days=30))
-                        ]
-                        if not recent_expenses.empty:
-                            unusual_expenses = recent_expenses[recent_expenses['amount'] > recent_expenses['amount'].mean() * 1.5]
+                            # Expenses flagged as unusual for their category when added
+                            unusual_expenses = get_anomalies(st.session_state.user_id)
                             if not unusual_expenses.empty:
                                 st.write("\n🔍 I noticed some unusually large expenses recently:")
                                 for _, expense in unusual_expenses.iterrows():
-                                    st.write(f"- ${expense['amount']:,.2f} on {expense['category']} ({expense['date'].strftime('%Y-%m-%d')})")
+                                    st.write(f"- ${expense['amount']:,.2f} on {expense['category']} "
+                                             f"({expense['date'].strftime('%Y-%m-%d')}), "
+                                             f"{expense['score']:.1f}σ above your usual ${expense['mean']:,.2f}")
                     
-                    elif question == "Am I on track with my budgets?":
-                        if not budgets_df.empty:
-                            st.write("🎯 Budget Progress Analysis:")
-                            for _, budget_row in budgets_df.iterrows():
-                                category = budget_row['category']
-                                budget_amount = budget_row['amount']
-                                spent = current_month_expenses.get(category, 0)
-                                progress = (spent / budget_amount) * 100 if budget_amount > 0 else 0
-                                
-                                if progress >= 90:
-                                    st.error(f"⚠️ {category}: You've used {progress:.1f}% of your budget!")
-                                elif progress >= 75:
-                                    st.warning(f"⚠️ {category}: You've used {progress:.1f}% of your budget")
-                                else:
-                                    st.success(f"✅ {category}: You've used {progress:.1f}% of your budget")
-                        else:
-                            st.info("You haven't set any budgets yet. Set them in the Budget tab!")
+                        elif question == "Am I on track with my budgets?":
+                            # Spent vs limit for every active budget
+                            budget_status = evaluate_budgets(st.session_state.user_id)
+                            if not budget_status.empty:
+                                st.write("🎯 Budget Progress Analysis:")
+                                show_budget_status(budget_status, on_track=True)
+                            else:
+                                st.info("You haven't set any budgets yet. Set them in the Budget tab!")
                     
-                    elif question == "What are my highest expenses?":
-                        st.write("💰 Here are your top expenses:")
-                        fig = px.bar(
-                            x=top_expenses.head(5).index,
-                            y=top_expenses.head(5).values,
-                            title="Top 5 Expense Categories"
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
+                        elif question == "What are my highest expenses?":
+                            st.write("💰 Here are your top expenses:")
+                            fig = px.bar(
+                                x=top_expenses.head(5).index,
+                                y=top_expenses.head(5).values,
+                                title="Top 5 Expense Categories"
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
                         
-                        # Provide specific insights
-                        st.write("\n📝 Key observations:")
-                        for category, amount in top_expenses.head(5).items():
-                            percentage = (amount / top_expenses.sum()) * 100
-                            st.write(f"- {category}: ${amount:,.2f} ({percentage:.1f}% of total expenses)")
+                            # Provide specific insights
+                            st.write("\n📝 Key observations:")
+                            for category, amount in top_expenses.head(5).items():
+                                percentage = (amount / top_expenses.sum()) * 100
+                                st.write(f"- {category}: ${amount:,.2f} ({percentage:.1f}% of total expenses)")
                     
-                    elif question == "How is my income-expense ratio?":
-                        st.write(f"📊 Your income-expense ratio is {income_expense_ratio:.2f}")
-                        if income_expense_ratio < 1:
-                            st.error("⚠️ You're spending more than you're earning!")
-                        elif income_expense_ratio < 1.2:
-                            st.warning("⚠️ Your spending is close to your income. Consider saving more!")
-                        else:
-                            st.success("✅ You're earning more than you're spending - great job!")
+                        elif question == "How is my income-expense ratio?":
+                            st.write(f"📊 Your income-expense ratio is {expense_ratio:.2f}")
+                            if expense_ratio < 1:
+                                st.error("⚠️ You're spending more than you're earning!")
+                            elif expense_ratio < 1.2:
+                                st.warning("⚠️ Your spending is close to your income. Consider saving more!")
+                            else:
+                                st.success("✅ You're earning more than you're spending - great job!")
                         
-                        # Show monthly comparison
-                        monthly_comparison = pd.DataFrame({
-                            'Income': df[df['type'] == 'Income'].groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum(),
-                            'Expenses': df[df['type'] == 'Expense'].groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum()
-                        })
-                        fig = px.bar(monthly_comparison, barmode='group', title="Monthly Income vs Expenses")
-                        st.plotly_chart(fig, use_container_width=True)
+                            # Show monthly comparison
+                            fig = px.bar(insights['comparison'], barmode='group', title="Monthly Income vs Expenses")
+                            st.plotly_chart(fig, use_container_width=True)
                     
-        else:
-            st.info("Add some transactions to get personalized insights!")
+            else:
+                st.info("Add some transactions to get personalized insights!")
 
-    with tab6:
-        st.header("Debt Tracker")
+    if tab6.open:
+        with tab6, span('Debt Tracker tab', 'tab'):
+            st.header("Debt Tracker")
         
-        # Add new debt section
-        with st.expander("Add New Debt", expanded=True):
-            col1, col2 = st.columns(2)
-            with col1:
-                debt_name = st.text_input("Debt Name", placeholder="e.g., Car Loan, Credit Card")
-                debt_type = st.selectbox("Type", [
-                    "Credit Card", "Student Loan", "Personal Loan", 
-                    "Mortgage", "Auto Loan", "Medical Debt", "Other"
-                ])
-                amount = st.number_input("Total Amount", min_value=0.0, step=100.0)
-            with col2:
-                interest_rate = st.number_input("Interest Rate (%)", min_value=0.0, step=0.1)
-                minimum_payment = st.number_input("Minimum Monthly Payment", min_value=0.0, step=10.0)
-                due_date = st.date_input("Next Due Date")
+            # Add new debt section
+            with st.expander("Add New Debt", expanded=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    debt_name = st.text_input("Debt Name", placeholder="e.g., Car Loan, Credit Card")
+                    debt_type = st.selectbox("Type", [
+                        "Credit Card", "Student Loan", "Personal Loan", 
+                        "Mortgage", "Auto Loan", "Medical Debt", "Other"
+                    ])
+                    amount = st.number_input("Total Amount", min_value=0.0, step=100.0)
+                with col2:
+                    interest_rate = st.number_input("Interest Rate (%)", min_value=0.0, step=0.1)
+                    minimum_payment = st.number_input("Minimum Monthly Payment", min_value=0.0, step=10.0)
+                    due_date = st.date_input("Next Due Date")
                 
-            if st.button("Add Debt", type="primary"):
-                if debt_name and amount > 0:
-                    add_debt(
-                        st.session_state.user_id,
-                        debt_name,
-                        debt_type,
-                        amount,
-                        interest_rate,
-                        minimum_payment,
-                        due_date.strftime("%Y-%m-%d")
-                    )
-                    st.success("Debt added successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please fill in all required fields")
+                if st.button("Add Debt", type="primary"):
+                    if debt_name and amount > 0:
+                        add_debt(
+                            st.session_state.user_id,
+                            debt_name,
+                            debt_type,
+                            amount,
+                            interest_rate,
+                            minimum_payment,
+                            due_date.strftime("%Y-%m-%d")
+                        ).result()
+                        alert_scheduler.wake()
+                        st.success("Debt added successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in all required fields")
         
-        # Display existing debts
-        debts_df = get_debts(st.session_state.user_id)
-        if not debts_df.empty:
-            st.subheader("Your Debts")
+            # Debts with their projections; row actions rerun only this part of the tab
+            @st.fragment
+            def debt_overview():
+                # Display existing debts
+                debts_df = get_debts(st.session_state.user_id)
+                if not debts_df.empty:
+                    st.subheader("Your Debts")
             
-            # Summary metrics
-            total_debt = debts_df['amount'].sum()
-            total_monthly_payments = debts_df['minimum_payment'].sum()
-            weighted_avg_interest = (debts_df['amount'] * debts_df['interest_rate']).sum() / total_debt
+                    # Summary metrics
+                    total_debt = debts_df['amount'].sum()
+                    total_monthly_payments = debts_df['minimum_payment'].sum()
+                    weighted_avg_interest = (debts_df['amount'] * debts_df['interest_rate']).sum() / total_debt
             
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Total Debt", f"${total_debt:,.2f}")
-            col2.metric("Monthly Payments", f"${total_monthly_payments:,.2f}")
-            col3.metric("Avg Interest Rate", f"{weighted_avg_interest:.1f}%")
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Total Debt", f"${total_debt:,.2f}")
+                    col2.metric("Monthly Payments", f"${total_monthly_payments:,.2f}")
+                    col3.metric("Avg Interest Rate", f"{weighted_avg_interest:.1f}%")
             
-            # Debt breakdown visualization
-            st.subheader("Debt Breakdown")
-            fig = px.pie(debts_df, values='amount', names='type', 
-                        title="Debt Distribution by Type")
-            st.plotly_chart(fig, use_container_width=True)
+                    # Debt breakdown visualization
+                    st.subheader("Debt Breakdown")
+                    fig = px.pie(debts_df, values='amount', names='type', 
+                                title="Debt Distribution by Type")
+                    st.plotly_chart(fig, use_container_width=True)
             
-            # List all debts with progress tracking
-            st.subheader("Debt Details")
-            for _, debt in debts_df.iterrows():
-                with st.container():
-                    cols = st.columns([3, 2, 2, 1])
+                    # List all debts with progress tracking
+                    st.subheader("Debt Details")
+                    for _, debt in debts_df.iterrows():
+                        with st.container():
+                            cols = st.columns([3, 2, 2, 1])
                     
-                    cols[0].write(f"**{debt['name']}** ({debt['type']})")
-                    cols[0].write(f"Amount: ${debt['amount']:,.2f}")
+                            cols[0].write(f"**{debt['name']}** ({debt['type']})")
+                            cols[0].write(f"Amount: ${debt['amount']:,.2f}")
                     
-                    cols[1].write("Interest Rate")
-                    cols[1].write(f"{debt['interest_rate']}%")
+                            cols[1].write("Interest Rate")
+                            cols[1].write(f"{debt['interest_rate']}%")
                     
-                    cols[2].write("Next Due Date")
-                    due_date = pd.to_datetime(debt['due_date']).date()
-                    days_until_due = (due_date - datetime.now().date()).days
-                    if days_until_due <= 7:
-                        cols[2].error(f"{days_until_due} days left")
-                    else:
-                        cols[2].write(f"{days_until_due} days left")
+                            cols[2].write("Next Due Date")
+                            days_until_due = debt['days_left']
+                            if days_until_due <= 7:
+                                cols[2].error(f"{days_until_due} days left")
+                            else:
+                                cols[2].write(f"{days_until_due} days left")
                     
-                    update_col = cols[3]
-                    if update_col.button("Update", key=f"update_debt_{debt['id']}"):
-                        st.session_state.editing_debt = debt['id']
-                    if update_col.button("Paid", key=f"paid_debt_{debt['id']}"):
-                        mark_debt_paid(debt['id'])
-                        st.success("Debt marked as paid and added to transactions!")
-                        st.rerun()
+                            update_col = cols[3]
+                            if update_col.button("Update", key=f"update_debt_{debt['id']}"):
+                                st.session_state.editing_debt = debt['id']
+                            if update_col.button("Paid", key=f"paid_debt_{debt['id']}"):
+                                if mark_debt_paid(st.session_state.user_id, debt['id']) is None:
+                                    st.info("This debt was already paid or no longer exists.")
+                                else:
+                                    alert_scheduler.wake()
+                                    st.success("Debt marked as paid and added to transactions!")
+                                    rerun_fragment()
                     
-                    if hasattr(st.session_state, 'editing_debt') and st.session_state.editing_debt == debt['id']:
-                        new_amount = st.number_input(
-                            "Current Amount",
-                            value=float(debt['amount']),
-                            min_value=0.0,
-                            step=10.0
-                        )
-                        if st.button("Save Changes"):
-                            update_debt(debt['id'], new_amount)
-                            del st.session_state.editing_debt
-                            st.success("Debt updated!")
-                            st.rerun()
+                            if hasattr(st.session_state, 'editing_debt') and st.session_state.editing_debt == debt['id']:
+                                new_amount = st.number_input(
+                                    "Current Amount",
+                                    value=float(debt['amount']),
+                                    min_value=0.0,
+                                    step=10.0
+                                )
+                                if st.button("Save Changes"):
+                                    update_debt(debt['id'], new_amount)
+                                    del st.session_state.editing_debt
+                                    st.success("Debt updated!")
+                                    rerun_fragment()
                     
-                    st.divider()
+                            st.divider()
             
-            # Debt payoff projections
-            st.subheader("Debt Payoff Projections")
-            months_to_payoff = total_debt / total_monthly_payments
-            interest_paid = (total_debt * weighted_avg_interest/100 * months_to_payoff/12)
+                    # Debt payoff projections
+                    st.subheader("Debt Payoff Projections")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        strategy = st.selectbox(
+                            "Payoff Strategy",
+                            STRATEGIES,
+                            key="debt_strategy",
+                            help="Avalanche pays the highest interest rate first, Snowball the smallest balance first"
+                        )
+                    with col2:
+                        extra_payment = st.number_input("Extra Monthly Payment", min_value=0.0, step=10.0,
+                                                        key="debt_extra_payment")
             
-            col1, col2 = st.columns(2)
-            col1.metric("Estimated Months to Payoff", f"{months_to_payoff:.1f} months")
-            col2.metric("Estimated Interest to be Paid", f"${interest_paid:,.2f}")
+                    custom_order = None
+                    if strategy == "Custom":
+                        debt_names = dict(zip(debts_df['id'], debts_df['name']))
+                        custom_order = st.multiselect("Pay off in this order", list(debt_names),
+                                                      default=list(debt_names), format_func=debt_names.get,
+                                                      key="debt_custom_order")
+                        # Debts left out keep their place after the chosen ones
+                        custom_order += [debt_id for debt_id in debt_names if debt_id not in custom_order]
             
-        else:
-            st.info("You haven't added any debts yet. Add one above to start tracking!")
-
-    with tab7:
-        st.header("Bill Reminders")
-        
-        # Add new bill reminder section
-        with st.expander("Add New Bill Reminder", expanded=True):
-            col1, col2 = st.columns(2)
-            with col1:
-                bill_name = st.text_input("Bill Name", placeholder="e.g., Electricity, Internet")
-                bill_amount = st.number_input("Amount", min_value=0.0, step=1.0)
-            with col2:
-                due_date = st.date_input("Due Date")
-                frequency = st.selectbox(
-                    "Frequency",
-                    ["Monthly", "Weekly", "Quarterly", "Annually", "One-time"]
-                )
+                    payoff_summary, payoff_schedule = project_debts(debts_df, strategy, extra_payment, custom_order)
             
-            if st.button("Add Bill Reminder", type="primary"):
-                if bill_name and bill_amount > 0:
-                    add_bill_reminder(
-                        st.session_state.user_id,
-                        bill_name,
-                        bill_amount,
-                        due_date.strftime("%Y-%m-%d"),
-                        frequency
+                    col1, col2 = st.columns(2)
+                    if payoff_summary['payoff_month'].isna().any():
+                        col1.metric("Estimated Months to Payoff", f"Over {MAX_MONTHS} months")
+                        st.warning("Some debts won't be paid off within 30 years at these payments.")
+                    else:
+                        col1.metric("Estimated Months to Payoff", f"{payoff_summary['payoff_month'].max():.0f} months")
+                    col2.metric("Estimated Interest to be Paid", f"${payoff_summary['interest'].sum():,.2f}")
+            
+                    fig = px.area(payoff_schedule, x='month', y='balance', color='name',
+                                  title=f"Projected Balances - {strategy}")
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.dataframe(
+                        payoff_summary[['name', 'payoff_date', 'interest']],
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={
+                            "name": "Debt",
+                            "payoff_date": st.column_config.DateColumn("Paid Off", format="MMM YYYY"),
+                            "interest": st.column_config.NumberColumn("Interest", format="$%.2f"),
+                        }
                     )
-                    st.success("Bill reminder added successfully!")
-                    st.rerun()
+            
+                    # Batch what-if analysis over extra payments, strategies and rate changes
+                    with st.expander("What-If Scenarios"):
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            max_extra = st.number_input("Up to Extra Monthly Payment", min_value=0.0,
+                                                        value=500.0, step=50.0, key="whatif_max_extra")
+                        with col2:
+                            extra_steps = st.slider("Payment Steps", 2, 200, 50, key="whatif_steps")
+                        with col3:
+                            rate_changes = st.multiselect("Rate Changes (percentage points)",
+                                                          [-3, -2, -1, 0, 1, 2, 3], default=[-1, 0, 1],
+                                                          key="whatif_rate_changes")
+                
+                        scenario_strategies = ["Avalanche", "Snowball"] + (["Custom"] if custom_order else [])
+                        scenarios = solve_scenarios(
+                            debts_df[['id', 'name', 'amount', 'interest_rate', 'minimum_payment']],
+                            tuple(np.linspace(0.0, max_extra, extra_steps).round(2)),
+                            tuple(scenario_strategies),
+                            tuple(rate_changes or [0]),
+                            tuple(custom_order) if custom_order else None
+                        )
+                        st.caption(f"Evaluated {len(scenarios):,} scenarios")
+                
+                        best = scenarios.iloc[0]
+                        if best['paid_off']:
+                            st.success(
+                                f"Lowest interest: {best['strategy']} with ${best['extra_payment']:,.2f} extra per month "
+                                f"({best['rate_change']:+d} pts) - debt-free in {best['months']} months, "
+                                f"${best['total_interest']:,.2f} interest"
+                            )
+                
+                        frontier = scenarios[scenarios['pareto']].sort_values(
+                            ['extra_payment', 'months', 'total_interest'], ignore_index=True)
+                        if not frontier.empty:
+                            fig = px.scatter(frontier, x='months', y='total_interest', color='strategy',
+                                             hover_data=['extra_payment', 'rate_change'],
+                                             title="Time vs. Interest (best trade-offs)")
+                            st.plotly_chart(fig, use_container_width=True)
+                            st.dataframe(
+                                frontier.drop(columns=['paid_off', 'pareto']),
+                                hide_index=True,
+                                use_container_width=True,
+                                column_config={
+                                    "extra_payment": st.column_config.NumberColumn("Extra / Month", format="$%.2f"),
+                                    "strategy": "Strategy",
+                                    "rate_change": "Rate Change",
+                                    "months": "Months",
+                                    "total_interest": st.column_config.NumberColumn("Interest", format="$%.2f"),
+                                }
+                            )
+            
                 else:
-                    st.error("Please fill in all required fields")
+                    st.info("You haven't added any debts yet. Add one above to start tracking!")
+
+            debt_overview()
+
+    if tab7.open:
+        with tab7, span('Bills tab', 'tab'):
+            st.header("Bill Reminders")
         
-        # Display existing bill reminders
-        reminders_df = get_bill_reminders(st.session_state.user_id)
-        if not reminders_df.empty:
-            # Summary metrics
-            total_bills = reminders_df['amount'].sum()
-            upcoming_bills = reminders_df[
-                pd.to_datetime(reminders_df['due_date']) <= datetime.now() + timedelta(days=7)
-            ]
+            # Add new bill reminder section
+            with st.expander("Add New Bill Reminder", expanded=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    bill_name = st.text_input("Bill Name", placeholder="e.g., Electricity, Internet")
+                    bill_amount = st.number_input("Amount", min_value=0.0, step=1.0)
+                with col2:
+                    due_date = st.date_input("Due Date")
+                    frequency = st.selectbox("Frequency", FREQUENCIES)
+            
+                if st.button("Add Bill Reminder", type="primary"):
+                    if bill_name and bill_amount > 0:
+                        add_bill_reminder(
+                            st.session_state.user_id,
+                            bill_name,
+                            bill_amount,
+                            due_date.strftime("%Y-%m-%d"),
+                            frequency
+                        ).result()
+                        alert_scheduler.wake()
+                        st.success("Bill reminder added successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in all required fields")
+        
+            # Bills with their calendar; row actions rerun only this part of the tab
+            @st.fragment
+            def bill_overview():
+                # Display existing bill reminders
+                reminders_df = get_bill_reminders(st.session_state.user_id)
+                if not reminders_df.empty:
+                    # Summary metrics
+                    total_bills = reminders_df['amount'].sum()
+                    due_count, due_total = get_bills_due(st.session_state.user_id, days=7)
+            
+                    col1, col2 = st.columns(2)
+                    col1.metric("Total Upcoming Bills", f"${total_bills:,.2f}")
+                    col2.metric("Due This Week", due_count, f"${due_total:,.2f}", delta_color="off")
             
-            col1, col2 = st.columns(2)
-            col1.metric("Total Upcoming Bills", f"${total_bills:,.2f}")
-            col2.metric("Due This Week", len(upcoming_bills))
+                    # Twelve months of scheduled bill payments
+                    st.subheader("Bill Calendar")
+                    calendar = get_bill_calendar(st.session_state.user_id)
+                    fig = px.bar(calendar, x=calendar.index, y='total',
+                                 hover_data=['bills'],
+                                 labels={'year_month': 'Month', 'total': 'Amount Due', 'bills': 'Bills'},
+                                 title="Scheduled Bill Payments by Month")
+                    st.plotly_chart(fig, use_container_width=True)
             
-            # List all bill reminders
-            st.subheader("Upcoming Bills")
-            for _, reminder in reminders_df.iterrows():
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+                    # List all bill reminders
+                    st.subheader("Upcoming Bills")
+                    for _, reminder in reminders_df.iterrows():
+                        with st.container():
+                            col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
                     
-                    with col1:
-                        st.write(f"**{reminder['name']}**")
-                        st.write(f"Amount: ${reminder['amount']:,.2f}")
+                            with col1:
+                                st.write(f"**{reminder['name']}**")
+                                st.write(f"Amount: ${reminder['amount']:,.2f}")
                     
-                    with col2:
-                        st.write("Frequency")
-                        st.write(reminder['frequency'])
+                            with col2:
+                                st.write("Frequency")
+                                st.write(reminder['frequency'])
                     
-                    with col3:
-                        st.write("Due Date")
-                        due_date = pd.to_datetime(reminder['due_date']).date()
-                        days_until_due = (due_date - datetime.now().date()).days
-                        if days_until_due <= 3:
-                            st.error(f"{days_until_due} days left")
-                        elif days_until_due <= 7:
-                            st.warning(f"{days_until_due} days left")
-                        else:
-                            st.write(f"{days_until_due} days left")
+                            with col3:
+                                st.write("Due Date")
+                                st.write(reminder['due_date'])
+                                days_until_due = reminder['days_left']
+                                if days_until_due <= 3:
+                                    st.error(f"{days_until_due} days left")
+                                elif days_until_due <= 7:
+                                    st.warning(f"{days_until_due} days left")
+                                else:
+                                    st.write(f"{days_until_due} days left")
                     
-                    with col4:
-                        if st.button("Edit", key=f"edit_bill_{reminder['id']}"):
-                            st.session_state.editing_bill = reminder['id']
-                        if st.button("Paid", key=f"paid_bill_{reminder['id']}"):
-                            mark_bill_paid(reminder['id'])
-                            # Optionally add as transaction
-                            add_transaction(
-                                st.session_state.user_id,
-                                datetime.now().strftime("%Y-%m-%d"),
-                                "Expense",
-                                reminder['amount'],
-                                "Bills",
-                                reminder['name']
-                            )
-                            st.success("Bill marked as paid and added to transactions!")
-                            st.rerun()
+                            with col4:
+                                if st.button("Edit", key=f"edit_bill_{reminder['id']}"):
+                                    st.session_state.editing_bill = reminder['id']
+                                if st.button("Paid", key=f"paid_bill_{reminder['id']}"):
+                                    # Keyed by the occurrence shown, so a repeated click
+                                    # cannot pay the next one as well
+                                    paid = mark_bill_paid(st.session_state.user_id, reminder['id'],
+                                                          payment_key=f"bill:{reminder['id']}:{reminder['due_date']}")
+                                    if paid is None:
+                                        st.info("This bill was already paid or no longer exists.")
+                                    else:
+                                        alert_scheduler.wake()
+                                        st.success("Bill marked as paid and added to transactions!")
+                                        rerun_fragment()
                     
-                    # Edit form
-                    if hasattr(st.session_state, 'editing_bill') and st.session_state.editing_bill == reminder['id']:
-                        with st.container():
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                new_name = st.text_input("Name", value=reminder['name'])
-                                new_amount = st.number_input("Amount", value=float(reminder['amount']), min_value=0.0)
-                            with col2:
-                                new_due_date = st.date_input("Due Date", value=pd.to_datetime(reminder['due_date']))
-                                new_frequency = st.selectbox(
-                                    "Frequency",
-                                    ["Monthly", "Weekly", "Quarterly", "Annually", "One-time"],
-                                    index=["Monthly", "Weekly", "Quarterly", "Annually", "One-time"].index(reminder['frequency'])
-                                )
+                            # Edit form
+                            if hasattr(st.session_state, 'editing_bill') and st.session_state.editing_bill == reminder['id']:
+                                with st.container():
+                                    col1, col2 = st.columns(2)
+                                    with col1:
+                                        new_name = st.text_input("Name", value=reminder['name'])
+                                        new_amount = st.number_input("Amount", value=float(reminder['amount']), min_value=0.0)
+                                    with col2:
+                                        new_due_date = st.date_input("Due Date", value=pd.to_datetime(reminder['due_date']))
+                                        new_frequency = st.selectbox(
+                                            "Frequency",
+                                            FREQUENCIES,
+                                            index=FREQUENCIES.index(reminder['frequency'])
+                                        )
                             
-                            if st.button("Save Changes"):
-                                update_bill_reminder(
-                                    reminder['id'],
-                                    new_name,
-                                    new_amount,
-                                    new_due_date.strftime("%Y-%m-%d"),
-                                    new_frequency
-                                )
-                                del st.session_state.editing_bill
-                                st.success("Bill reminder updated!")
-                                st.rerun()
+                                    if st.button("Save Changes"):
+                                        update_bill_reminder(
+                                            reminder['id'],
+                                            new_name,
+                                            new_amount,
+                                            new_due_date.strftime("%Y-%m-%d"),
+                                            new_frequency
+                                        )
+                                        alert_scheduler.wake()
+                                        del st.session_state.editing_bill
+                                        st.success("Bill reminder updated!")
+                                        rerun_fragment()
                     
-                    st.divider()
-        else:
-            st.info("You haven't added any bill reminders yet. Add one above to start tracking!")
+                            st.divider()
+                else:
+                    st.info("You haven't added any bill reminders yet. Add one above to start tracking!")
+
+            bill_overview()
+
+    # Breakdown of this rerun for admins when profiling is enabled
+    trace = finish_trace()
+    if trace is not None and is_admin(username):
+        show_profiler(trace)
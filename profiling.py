@@ -0,0 +1,152 @@
+"""Opt-in per-rerun profiling.
+
+With LUCRUM_PROFILE=1 every script rerun records a trace: a timing span
+for each tab body and each instrumented data helper, plus how many SQL
+statements ran and how many rows the helpers returned inside each span.
+Users listed in LUCRUM_ADMINS (comma-separated usernames) get a sidebar
+panel with the breakdown of the latest rerun and a Chrome trace export
+(chrome://tracing or https://ui.perfetto.dev) of their recent reruns.
+
+When profiling is off the instrumentation costs one context lookup per call.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+import streamlit as st
+
+ENABLED = os.environ.get('LUCRUM_PROFILE', '') not in ('', '0')
+ADMINS = {name.strip() for name in os.environ.get('LUCRUM_ADMINS', '').split(',') if name.strip()}
+KEPT_TRACES = 20
+
+# Each Streamlit session runs its script on its own thread, so the active
+# trace is per rerun; writer and scheduler threads never see one
+_current = ContextVar('lucrum_trace', default=None)
+
+
+class Trace:
+    """Spans and SQL counters collected during one rerun."""
+
+    def __init__(self, label):
+        self.label = label
+        self.wall_start = time.time()
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.spans = []
+        self.statements = 0
+        self.rows = 0
+        self.depth = 0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def breakdown(self):
+        # One row per span name, slowest first; sql and rows include nested spans
+        if not self.spans:
+            return pd.DataFrame(columns=['span', 'calls', 'ms', 'sql', 'rows'])
+        spans = pd.DataFrame(self.spans)
+        table = spans.groupby('name').agg(calls=('name', 'size'), ms=('duration', 'sum'),
+                                          sql=('statements', 'sum'), rows=('rows', 'sum'))
+        table['ms'] = (table['ms'] * 1000).round(2)
+        return table.sort_values('ms', ascending=False).rename_axis('span').reset_index()
+
+
+def start_trace(label='rerun'):
+    if not ENABLED:
+        return None
+    trace = Trace(label)
+    _current.set(trace)
+    return trace
+
+def finish_trace():
+    trace = _current.get()
+    if trace is not None:
+        trace.finish()
+        _current.set(None)
+    return trace
+
+@contextmanager
+def span(name, category='app'):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    statements, rows = trace.statements, trace.rows
+    trace.depth += 1
+    try:
+        yield
+    finally:
+        trace.depth -= 1
+        trace.spans.append({
+            'name': name,
+            'category': category,
+            'start': start - trace.started,
+            'duration': time.perf_counter() - start,
+            'depth': trace.depth,
+            'statements': trace.statements - statements,
+            'rows': trace.rows - rows,
+        })
+
+def traced(category):
+    """Decorator recording a span per call, plus the rows of a returned frame."""
+    def decorate(func):
+        name = f'{func.__module__}.{func.__name__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with span(name, category):
+                result = func(*args, **kwargs)
+                # Helpers return a frame, or a tuple that starts with one
+                frame = result[0] if isinstance(result, tuple) and result else result
+                if isinstance(frame, (pd.DataFrame, pd.Series)):
+                    trace.rows += len(frame)
+                return result
+        return wrapper
+    return decorate
+
+def count_statement(statement):
+    # sqlite3 trace callback, installed on pooled connections when enabled
+    trace = _current.get()
+    if trace is not None:
+        trace.statements += 1
+
+
+def chrome_trace(traces):
+    """Serialize traces in the Chrome trace event format, one track per rerun."""
+    events = []
+    for track, trace in enumerate(traces, start=1):
+        origin = trace.wall_start * 1e6
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': track,
+                       'args': {'name': f'{trace.label} {track}'}})
+        events.append({'name': trace.label, 'cat': 'rerun', 'ph': 'X', 'pid': 1, 'tid': track,
+                       'ts': origin, 'dur': (trace.elapsed or 0) * 1e6,
+                       'args': {'statements': trace.statements, 'rows': trace.rows}})
+        for s in trace.spans:
+            events.append({'name': s['name'], 'cat': s['category'], 'ph': 'X', 'pid': 1,
+                           'tid': track, 'ts': origin + s['start'] * 1e6, 'dur': s['duration'] * 1e6,
+                           'args': {'statements': s['statements'], 'rows': s['rows']}})
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+def is_admin(username):
+    return ENABLED and username in ADMINS
+
+def show_profiler(trace):
+    # Sidebar panel with the latest rerun; keeps this session's recent traces
+    history = st.session_state.setdefault('profile_traces', [])
+    history.append(trace)
+    del history[:-KEPT_TRACES]
+
+    with st.sidebar.expander("🛠 Profiler"):
+        st.metric("Rerun", f"{trace.elapsed * 1000:,.1f} ms")
+        st.caption(f"{trace.statements} SQL statements, {trace.rows:,} rows fetched")
+        st.dataframe(trace.breakdown(), hide_index=True, use_container_width=True)
+        st.download_button("Download Chrome trace", chrome_trace(history),
+                           file_name="lucrum-trace.json", mime="application/json")
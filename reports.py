@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database import get_connection
+from profiling import traced
+
+# Dashboard aggregates are served from monthly_rollup, which the schema keeps
+# current with triggers on transactions. Callers fetch a user's rollup once
+# per rerun and derive every chart from it, so the work scales with
+# months x categories rather than with the number of transactions.
+
+OVERVIEW_PERIODS = ["Last 7 days", "Last 30 days", "This Month", "This Year", "All Time"]
+
+@traced('db')
+def get_rollup(user_id):
+    with get_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT year_month, type, category, total, count
+            FROM monthly_rollup
+            WHERE user_id = ?
+            ORDER BY year_month''',
+            conn, params=(user_id,))
+    return df
+
+def monthly_totals(rollup, type_):
+    # Indexed by 'YYYY-MM' for every month that has at least one transaction
+    return rollup[rollup['type'] == type_].groupby('year_month')['total'].sum()
+
+def category_totals(rollup, type_, year_month=None):
+    rows = rollup[rollup['type'] == type_]
+    if year_month:
+        rows = rows[rows['year_month'] == year_month]
+    return rows.groupby('category')['total'].sum().sort_values(ascending=False)
+
+def period_start(period, today=None):
+    # First day included in an Overview period, or None for all time
+    today = (today or datetime.now()).date()
+    if period == "Last 7 days":
+        return today - timedelta(days=7)
+    if period == "Last 30 days":
+        return today - timedelta(days=30)
+    if period == "This Month":
+        return today.replace(day=1)
+    if period == "This Year":
+        return today.replace(month=1, day=1)
+    return None
+
+@traced('db')
+def get_period_summary(user_id, period):
+    """Per-category sums for an Overview period plus all-time totals.
+
+    Returns ``(by_category, total_income, total_expense)`` from one
+    statement. Month-aligned periods read monthly_rollup; rolling windows
+    range-scan the (user_id, date) index on transactions.
+    """
+    start = period_start(period)
+    if start is None or start.day == 1:
+        period_rows = '''
+            SELECT 'period' AS scope, type, category, SUM(total) AS total
+            FROM monthly_rollup
+            WHERE user_id = ? AND year_month >= ?
+            GROUP BY type, category'''
+        since = start.strftime('%Y-%m') if start else ''
+    else:
+        period_rows = '''
+            SELECT 'period' AS scope, type, category, SUM(amount) AS total
+            FROM transactions
+            WHERE user_id = ? AND date >= ?
+            GROUP BY type, category'''
+        since = start.strftime('%Y-%m-%d')
+
+    with get_connection() as conn:
+        df = pd.read_sql_query(period_rows + '''
+            UNION ALL
+            SELECT 'all' AS scope, type, NULL AS category, SUM(total) AS total
+            FROM monthly_rollup
+            WHERE user_id = ?
+            GROUP BY type''',
+            conn, params=(user_id, since, user_id))
+
+    totals = df[df['scope'] == 'all'].set_index('type')['total']
+    by_category = df.loc[df['scope'] == 'period', ['type', 'category', 'total']]
+    return by_category, totals.get('Income', 0.0), totals.get('Expense', 0.0)
@@ -0,0 +1,475 @@
+import streamlit as st
+
+from anomalies import IS_ANOMALY
+from database import SEARCH_ID_BITS, compact_change_log, get_connection
+
+# Each migration brings the database from version N-1 to version N, where N
+# is its position in MIGRATIONS. The applied version is kept in
+# PRAGMA user_version so startup only does DDL when something is pending.
+
+def _v1_base_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL,
+        period TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        UNIQUE(user_id, category, period, start_date)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS debts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        interest_rate REAL NOT NULL DEFAULT 0,
+        minimum_payment REAL NOT NULL DEFAULT 0,
+        due_date TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Active',
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS bill_reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        amount REAL NOT NULL,
+        due_date TEXT NOT NULL,
+        frequency TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Pending',
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+
+
+def _v2_per_user_indexes(conn):
+    # Match the per-user access paths so lookups are index range scans that
+    # already come back in the requested order, with no separate sort step
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+                    ON transactions (user_id, date DESC, id DESC)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_budgets_user_period
+                    ON budgets (user_id, period, start_date)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_debts_user_status_due
+                    ON debts (user_id, status, due_date)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_bill_reminders_user_status_due
+                    ON bill_reminders (user_id, status, due_date)''')
+    conn.execute('ANALYZE')
+
+
+def _v3_transaction_change_log(conn):
+    # Every insert, update and delete on transactions is logged with a
+    # monotonically increasing seq, so cached frames can pull just the delta
+    conn.execute('''CREATE TABLE IF NOT EXISTS transaction_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        transaction_id INTEGER NOT NULL
+    )''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_transaction_changes_user_seq
+                    ON transaction_changes (user_id, seq)''')
+
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_transactions_log_insert
+                    AFTER INSERT ON transactions
+                    BEGIN
+                        INSERT INTO transaction_changes (user_id, transaction_id)
+                        VALUES (NEW.user_id, NEW.id);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_transactions_log_update
+                    AFTER UPDATE ON transactions
+                    BEGIN
+                        INSERT INTO transaction_changes (user_id, transaction_id)
+                        VALUES (NEW.user_id, NEW.id);
+                        INSERT INTO transaction_changes (user_id, transaction_id)
+                        SELECT OLD.user_id, OLD.id WHERE OLD.user_id IS NOT NEW.user_id;
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_transactions_log_delete
+                    AFTER DELETE ON transactions
+                    BEGIN
+                        INSERT INTO transaction_changes (user_id, transaction_id)
+                        VALUES (OLD.user_id, OLD.id);
+                    END''')
+
+
+def _v4_monthly_rollup(conn):
+    # Per user/month/type/category totals kept current by triggers, so the
+    # dashboards never aggregate raw transactions
+    conn.execute('''CREATE TABLE IF NOT EXISTS monthly_rollup (
+        user_id INTEGER NOT NULL,
+        year_month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, year_month, type, category)
+    ) WITHOUT ROWID''')
+
+    add_new = '''INSERT INTO monthly_rollup (user_id, year_month, type, category, total, count)
+                 VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+                 ON CONFLICT (user_id, year_month, type, category)
+                 DO UPDATE SET total = total + excluded.total, count = count + 1;'''
+    remove_old = '''UPDATE monthly_rollup SET total = total - OLD.amount, count = count - 1
+                    WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7)
+                      AND type = OLD.type AND category = OLD.category;
+                    DELETE FROM monthly_rollup
+                    WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7)
+                      AND type = OLD.type AND category = OLD.category AND count <= 0;'''
+
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert
+                     AFTER INSERT ON transactions
+                     BEGIN {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+                     AFTER UPDATE OF user_id, date, type, amount, category ON transactions
+                     BEGIN {remove_old} {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete
+                     AFTER DELETE ON transactions
+                     BEGIN {remove_old} END''')
+
+    conn.execute('DELETE FROM monthly_rollup')
+    conn.execute('''INSERT INTO monthly_rollup (user_id, year_month, type, category, total, count)
+                    SELECT user_id, substr(date, 1, 7), type, category, SUM(amount), COUNT(*)
+                    FROM transactions
+                    GROUP BY user_id, substr(date, 1, 7), type, category''')
+
+
+def _v5_transaction_search(conn):
+    # Trigram full-text index over description and category, so substring
+    # and prefix searches are index lookups instead of row-by-row scans
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5 (
+        description, category,
+        content='transactions', content_rowid='id', tokenize='trigram'
+    )''')
+
+    add_new = '''INSERT INTO transactions_fts (rowid, description, category)
+                 VALUES (NEW.id, NEW.description, NEW.category);'''
+    remove_old = '''INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+                    VALUES ('delete', OLD.id, OLD.description, OLD.category);'''
+
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert
+                     AFTER INSERT ON transactions
+                     BEGIN {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update
+                     AFTER UPDATE OF description, category ON transactions
+                     BEGIN {remove_old} {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete
+                     AFTER DELETE ON transactions
+                     BEGIN {remove_old} END''')
+
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def _v6_import_hashes(conn):
+    # Content hash of imported statement rows, unique per user so that
+    # re-importing a statement is a no-op; hand-entered rows leave it NULL
+    conn.execute('ALTER TABLE transactions ADD COLUMN import_hash TEXT')
+    conn.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_import_hash
+                    ON transactions (user_id, import_hash)
+                    WHERE import_hash IS NOT NULL''')
+
+    # Imported rows skip the per-row insert triggers; importer.py maintains
+    # the change log, rollup and search index for them with set-based
+    # statements once the whole statement has been inserted
+    conn.execute('DROP TRIGGER IF EXISTS trg_transactions_log_insert')
+    conn.execute('''CREATE TRIGGER trg_transactions_log_insert
+                    AFTER INSERT ON transactions WHEN NEW.import_hash IS NULL
+                    BEGIN
+                        INSERT INTO transaction_changes (user_id, transaction_id)
+                        VALUES (NEW.user_id, NEW.id);
+                    END''')
+    conn.execute('DROP TRIGGER IF EXISTS trg_transactions_rollup_insert')
+    conn.execute('''CREATE TRIGGER trg_transactions_rollup_insert
+                    AFTER INSERT ON transactions WHEN NEW.import_hash IS NULL
+                    BEGIN
+                        INSERT INTO monthly_rollup (user_id, year_month, type, category, total, count)
+                        VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+                        ON CONFLICT (user_id, year_month, type, category)
+                        DO UPDATE SET total = total + excluded.total, count = count + 1;
+                    END''')
+    conn.execute('DROP TRIGGER IF EXISTS trg_transactions_fts_insert')
+    conn.execute('''CREATE TRIGGER trg_transactions_fts_insert
+                    AFTER INSERT ON transactions WHEN NEW.import_hash IS NULL
+                    BEGIN
+                        INSERT INTO transactions_fts (rowid, description, category)
+                        VALUES (NEW.id, NEW.description, NEW.category);
+                    END''')
+
+
+def _v7_bill_calendar(conn):
+    # Recurring bills keep the date their schedule counts from, so month-end
+    # due dates survive being clamped in shorter months
+    conn.execute('ALTER TABLE bill_reminders ADD COLUMN anchor_date TEXT')
+    conn.execute('UPDATE bill_reminders SET anchor_date = due_date')
+
+    # Upcoming occurrences of every pending bill, materialized up to a
+    # per-user horizon so due-soon counts and the cash-flow calendar are
+    # range scans; database.py fills it lazily on first read
+    conn.execute('''CREATE TABLE IF NOT EXISTS bill_occurrences (
+        bill_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        due_date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (bill_id, due_date)
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_bill_occurrences_user_due
+                    ON bill_occurrences (user_id, due_date)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS bill_calendar (
+        user_id INTEGER PRIMARY KEY,
+        horizon TEXT NOT NULL
+    )''')
+
+
+def _v8_alerts(conn):
+    # Bill, debt and budget alerts written by the background scan in
+    # alerts.py; the UI reads a user's pending alerts with one index range
+    conn.execute('''CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        ref_id INTEGER NOT NULL,
+        alert_key TEXT NOT NULL,
+        level TEXT NOT NULL,
+        message TEXT NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        dismissed INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user_id, kind, ref_id, alert_key),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_alerts_user_pending
+                    ON alerts (user_id, dismissed, created_at DESC)''')
+
+
+def _v9_payments(conn):
+    # One row per bill or debt payment, keyed so that a repeated request
+    # (a double click, a retried rerun) cannot book the same payment twice
+    conn.execute('''CREATE TABLE IF NOT EXISTS payments (
+        user_id INTEGER NOT NULL,
+        payment_key TEXT NOT NULL,
+        transaction_id INTEGER,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (user_id, payment_key),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID''')
+
+
+def _v10_budget_history(conn):
+    # Budgets may carry their unspent amount into the next window
+    conn.execute('ALTER TABLE budgets ADD COLUMN rollover INTEGER NOT NULL DEFAULT 0')
+
+    # Actuals of every closed budget window, frozen once by budgets.py so
+    # history never rescans transactions for past windows
+    conn.execute('''CREATE TABLE IF NOT EXISTS budget_period_results (
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        period TEXT NOT NULL,
+        window_start TEXT NOT NULL,
+        window_end TEXT NOT NULL,
+        amount REAL NOT NULL,
+        carried_in REAL NOT NULL DEFAULT 0,
+        spent REAL NOT NULL,
+        PRIMARY KEY (user_id, category, period, window_start),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_budget_period_results_user_period
+                    ON budget_period_results (user_id, period, window_start)''')
+
+
+def _v11_expense_anomalies(conn):
+    # Running expense statistics per user and category (see anomalies.py),
+    # and the expenses flagged against them when they were inserted
+    conn.execute('''CREATE TABLE IF NOT EXISTS category_stats (
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        m2 REAL NOT NULL,
+        PRIMARY KEY (user_id, category),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS anomalies (
+        transaction_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL,
+        mean REAL NOT NULL,
+        variance REAL NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_anomalies_user_date
+                    ON anomalies (user_id, date)''')
+
+    # Checked against the statistics before the expense is added to them
+    flag_new = f'''INSERT INTO anomalies (transaction_id, user_id, date, category, amount, mean, variance)
+                    SELECT NEW.id, NEW.user_id, NEW.date, NEW.category, NEW.amount,
+                           s.mean, s.m2 / (s.count - 1)
+                    FROM category_stats s
+                    WHERE NEW.type = 'Expense' AND s.user_id = NEW.user_id
+                      AND s.category = NEW.category AND {IS_ANOMALY.format(x='NEW.amount')};'''
+    # Welford's update and its inverse
+    add_new = '''INSERT INTO category_stats (user_id, category, count, mean, m2)
+                 SELECT NEW.user_id, NEW.category, 1, NEW.amount, 0 WHERE NEW.type = 'Expense'
+                 ON CONFLICT (user_id, category) DO UPDATE SET
+                     count = count + 1,
+                     mean = mean + (excluded.mean - mean) / (count + 1),
+                     m2 = m2 + (excluded.mean - mean) * (excluded.mean - mean) * count / (count + 1);'''
+    remove_old = '''DELETE FROM anomalies WHERE transaction_id = OLD.id;
+                    DELETE FROM category_stats
+                    WHERE OLD.type = 'Expense' AND user_id = OLD.user_id
+                      AND category = OLD.category AND count <= 1;
+                    UPDATE category_stats SET
+                        count = count - 1,
+                        mean = (count * mean - OLD.amount) / (count - 1),
+                        m2 = MAX(m2 - (OLD.amount - mean) * (OLD.amount - mean) * count / (count - 1), 0)
+                    WHERE OLD.type = 'Expense' AND user_id = OLD.user_id
+                      AND category = OLD.category;'''
+
+    # Imported rows skip the insert trigger like the others; importer.py
+    # flags them and merges their statistics in bulk
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_stats_insert
+                     AFTER INSERT ON transactions
+                     WHEN NEW.import_hash IS NULL AND NEW.type = 'Expense'
+                     BEGIN {flag_new} {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_stats_update
+                     AFTER UPDATE OF user_id, date, type, amount, category ON transactions
+                     BEGIN {remove_old} {flag_new} {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_transactions_stats_delete
+                     AFTER DELETE ON transactions WHEN OLD.type = 'Expense'
+                     BEGIN {remove_old} END''')
+
+    conn.execute('DELETE FROM category_stats')
+    conn.execute('''INSERT INTO category_stats (user_id, category, count, mean, m2)
+                    SELECT user_id, category, COUNT(*), AVG(amount),
+                           MAX(SUM(amount * amount) - SUM(amount) * SUM(amount) / COUNT(*), 0)
+                    FROM transactions
+                    WHERE type = 'Expense'
+                    GROUP BY user_id, category''')
+
+
+def _v12_forecasts(conn):
+    # Latest cash-flow forecast per user (see forecast.py), with the data
+    # versions it was computed from so that it is only recomputed, in part
+    # or in full, once those change
+    conn.execute('''CREATE TABLE IF NOT EXISTS forecast_runs (
+        user_id INTEGER PRIMARY KEY,
+        start_date TEXT NOT NULL,
+        transactions_seq INTEGER NOT NULL,
+        schedule_hash TEXT NOT NULL,
+        start_balance REAL NOT NULL,
+        computed_at TEXT NOT NULL DEFAULT (datetime('now')),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS forecast_days (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        income REAL NOT NULL,
+        expenses REAL NOT NULL,
+        bills REAL NOT NULL,
+        debts REAL NOT NULL,
+        balance REAL NOT NULL,
+        PRIMARY KEY (user_id, date),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID''')
+
+
+def _v13_user_scoped_search(conn):
+    # Re-key the search index by (user_id << SEARCH_ID_BITS) + id, so that a
+    # search reads only the searching user's rowid range of each term
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_transactions_fts_{trigger}')
+    conn.execute('DROP TABLE IF EXISTS transactions_fts')
+
+    # External content needs a source with the same rowid for 'rebuild'
+    conn.execute(f'''CREATE VIEW IF NOT EXISTS transaction_search AS
+                     SELECT (user_id << {SEARCH_ID_BITS}) + id AS search_id, description, category
+                     FROM transactions''')
+    conn.execute('''CREATE VIRTUAL TABLE transactions_fts USING fts5 (
+        description, category,
+        content='transaction_search', content_rowid='search_id', tokenize='trigram'
+    )''')
+
+    add_new = f'''INSERT INTO transactions_fts (rowid, description, category)
+                  VALUES ((NEW.user_id << {SEARCH_ID_BITS}) + NEW.id, NEW.description, NEW.category);'''
+    remove_old = f'''INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+                     VALUES ('delete', (OLD.user_id << {SEARCH_ID_BITS}) + OLD.id,
+                             OLD.description, OLD.category);'''
+
+    # Imported rows are still indexed set-based by importer.py
+    conn.execute(f'''CREATE TRIGGER trg_transactions_fts_insert
+                     AFTER INSERT ON transactions WHEN NEW.import_hash IS NULL
+                     BEGIN {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER trg_transactions_fts_update
+                     AFTER UPDATE OF user_id, description, category ON transactions
+                     BEGIN {remove_old} {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER trg_transactions_fts_delete
+                     AFTER DELETE ON transactions
+                     BEGIN {remove_old} END''')
+
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+MIGRATIONS = [
+    _v1_base_tables,
+    _v2_per_user_indexes,
+    _v3_transaction_change_log,
+    _v4_monthly_rollup,
+    _v5_transaction_search,
+    _v6_import_hashes,
+    _v7_bill_calendar,
+    _v8_alerts,
+    _v9_payments,
+    _v10_budget_history,
+    _v11_expense_anomalies,
+    _v12_forecasts,
+    _v13_user_scoped_search,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    # Cheap check first so an up-to-date database never takes the write lock
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Re-read under the lock in case another process migrated meanwhile
+        version = get_schema_version(conn)
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+@st.cache_resource
+def ensure_schema():
+    # Runs once per process; reruns hit the cache and do no DDL at all
+    with get_connection() as conn:
+        migrate(conn)
+    compact_change_log()
+    return SCHEMA_VERSION